@@ -1,10 +1,7 @@
-import importlib.util, sys
+import importlib.util, sys, os, json, time, threading
 from pathlib import Path
-import copy
-from inspect import isclass
+from bbos import startup
 from collections import defaultdict, deque
-import types
-import ast
 
 # PEP 562
 _symbols = {
@@ -15,70 +12,133 @@ _symbols = {
     "state": "bbos.registry",
     "Writer": "bbos.ipc",
     "Reader": "bbos.ipc",
+    "wait_any": "bbos.ipc",
+    "ReaderGroup": "bbos.ipc",
     "AppManager": "bbos.app_manager",
 }
 
-_collected = False
 def __getattr__(name):
-    global _collected
     if name in _symbols:
-        if name in ("Config", "Type") and not _collected:
-            _collect_daemon_constants()
-            _collected = True
         mod = importlib.import_module(_symbols[name])
         val = getattr(mod, name)
         globals()[name] = val  # cache for next time
         return val
     raise AttributeError(f"module 'bbos' has no attribute '{name}'")
 
-def _collect_daemon_constants():
-    base = Path(__file__).parent / "daemons"
-    if not base.is_dir():
-        return
+# Daemon constants are loaded lazily: Config/Type look a name up in an index of which constants.py registers it,
+# then exec only that module and the ones it depends on. The index is rebuilt per file when its mtime or size
+# changes and persisted, so a warm start never parses a constants file. Composed nodes look names up from
+# their own threads, so the index build and module loading hold one lock.
+INDEX_VERSION = 1
+_index = None   # config/type name -> module name
+_modules = {}   # module name -> (path, module names it depends on)
+_loaded = set()
+_loading = set() # being executed, a dependency cycle stops here
+_depth = 0
+_lock = threading.RLock()
 
-    paths = {}
-    config_to_module = {}   # "camera" -> "bbos.daemons.camera.constants"
-    deps = defaultdict(set)
+def _index_path():
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "bbos" / "constants_index.json"
 
-    def scan_constants(pth):
-        src = pth.read_text()
-        tree = ast.parse(src, filename=str(pth))
-        configs = set()
-        deps = set()
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                for dec in node.decorator_list:
-                    if isinstance(dec, ast.Name) and dec.id == "register":
-                        configs.add(node.name)
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name) and node.func.id == "Config":
-                    if node.args and isinstance(node.args[0], ast.Constant):
-                        deps.add(node.args[0].value)
-        return configs, deps
+def _scan_constants(pth):
+    import ast # only needed when the index is stale
+    tree = ast.parse(pth.read_text(), filename=str(pth))
+    configs, types, deps = set(), set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+            for dec in node.decorator_list:
+                dec_name = dec.func.id if isinstance(dec, ast.Call) and isinstance(dec.func, ast.Name) else getattr(dec, "id", None)
+                if dec_name == "register":
+                    (configs if isinstance(node, ast.ClassDef) else types).add(node.name)
+                elif dec_name in ("realtime", "state"):
+                    types.add(node.name)
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id == "Config":
+                if node.args and isinstance(node.args[0], ast.Constant):
+                    deps.add(node.args[0].value)
+    return {"configs": sorted(configs), "types": sorted(types), "deps": sorted(deps)}
 
-    for sub in base.iterdir():
-        pth = sub / "constants.py"
-        if not pth.is_file():
-            continue
-        mod_name = f"{__name__}.daemons.{sub.name}.constants"
-        paths[mod_name] = pth
-        configs, cur_deps = scan_constants(pth)
-        for config in configs:
-            config_to_module[config] = mod_name
-        deps[mod_name] = cur_deps
+def _build_index():
+    global _index, _modules
+    t0 = time.monotonic_ns()
+    index, modules = {}, {}
+    base = Path(__file__).parent / "daemons"
+    if not base.is_dir():
+        _index = index
+        return
+    try:
+        cached = json.loads(_index_path().read_text())
+        files = cached["files"] if cached.get("version") == INDEX_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        files = {}
+    fresh, dirty = {}, False
+    for pth in sorted(base.glob("*/constants.py")):
+        st = pth.stat()
+        entry = files.get(str(pth))
+        if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, **_scan_constants(pth)}
+            dirty = True
+        fresh[str(pth)] = entry
+        mod_name = f"{__name__}.daemons.{pth.parent.name}.constants"
+        for key in entry["configs"] + entry["types"]:
+            index[key] = mod_name
+        modules[mod_name] = (pth, entry["deps"])
+    _modules, _index = modules, index # published complete
+    if dirty or len(fresh) != len(files):
+        try:
+            out = _index_path()
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"version": INDEX_VERSION, "files": fresh}))
+            os.replace(tmp, out)
+        except OSError:
+            pass # read-only home, the index is rebuilt next time
+    startup.add("constants_index", t0)
 
-    # topo sort modules by deps
-    normalize_deps = {k: {config_to_module[d] for d in deps[k]} for k in deps}
-    order = _topo_sort(normalize_deps)
-    # second pass: real execution in order
-    for mod_name in order:
-        spec = importlib.util.spec_from_file_location(mod_name, paths[mod_name])
+def _load_constants(mod_name):
+    """Executes mod_name after its dependencies, called with _lock held"""
+    global _depth
+    if mod_name in _loaded or mod_name in _loading:
+        return
+    _loading.add(mod_name)
+    t0 = time.monotonic_ns()
+    _depth += 1
+    try:
+        pth, deps = _modules[mod_name]
+        for dep in deps: # configs it reads at import time
+            if dep in _index:
+                _load_constants(_index[dep])
+        spec = importlib.util.spec_from_file_location(mod_name, pth)
         module = importlib.util.module_from_spec(spec)
         sys.modules[mod_name] = module
         try:
             spec.loader.exec_module(module)
+            _loaded.add(mod_name)
         except Exception as e:
+            del sys.modules[mod_name]
             print(f"[!] Error loading {mod_name}: {e}")
+    finally:
+        _loading.discard(mod_name)
+        _depth -= 1
+    if _depth == 0: # dependencies load inside their dependent
+        startup.add("constants", t0)
+
+def _require(name):
+    """Loads the constants module registering the config or type name, returns every indexed name"""
+    with _lock:
+        if _index is None:
+            _build_index()
+        if name in _index:
+            _load_constants(_index[name])
+        return _index.keys()
+
+def _collect_daemon_constants():
+    """Loads every constants module, in dependency order"""
+    with _lock:
+        if _index is None:
+            _build_index()
+        for mod_name in _topo_sort({m: {_index[d] for d in deps if _index.get(d, m) != m} for m, (_, deps) in _modules.items()}):
+            _load_constants(mod_name)
 
 def _topo_sort(deptree):
     indeg = defaultdict(int)
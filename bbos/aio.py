@@ -0,0 +1,209 @@
+"""
+asyncio variants of Reader and Writer, for apps that also serve HTTP or websockets from an event loop.
+
+    from bbos.aio import Reader, Writer
+
+    async def main():
+        with Reader("camera.points") as r, Writer("mapping.voxels", Type("mapping_voxels")) as w:
+            while True:
+                points = await r.next()
+                async with w.buf() as b:
+                    ...
+
+Awaiting readers never poll. One waker thread per event loop sleeps in futex_waitv on the publish futex of every
+topic being awaited and signals the loop through an eventfd registered with add_reader, so one loop multiplexes
+dozens of topics (up to 127 awaited at once) at the cost of a single sleeping thread. Neither class takes part in
+Loop: readers run when a sample arrives, and each writer arms a timerfd at its next deadline, which wakes the
+loop within tens of microseconds where asyncio.sleep is only good to a millisecond or two. Under a SimClock writers
+wait on the clock's futex through the same waker, so they keep pace with the bag at any replay speed.
+"""
+from bbos import ipc
+from bbos.ipc import futex_wait, futex_wake, futex_wait_many, libc, CLOCK_MONOTONIC
+from bbos.time import monotonic_ns, timespec, clock, SimClock
+
+import os, time, ctypes, asyncio, threading, contextlib, weakref
+import numpy as np
+
+MAX_WAIT = 127 # futex_waitv takes 128 words, one is the waker's control word
+POLL = 0.01 # s between connection attempts while a topic has no writer, as in wait_any
+LIVENESS = 1.0 # s between wakeups that recheck whether awaited writers are still up
+TFD_TIMER_ABSTIME = 1
+TFD_NONBLOCK, TFD_CLOEXEC = os.O_NONBLOCK, os.O_CLOEXEC
+
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", timespec),
+                ("it_value", timespec)]
+
+
+class _Waker:
+    """Sleeps on the futex words awaited in one event loop and wakes the loop through an eventfd"""
+    def __init__(self, loop):
+        self._loop = loop
+        self._efd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        self._ctl = np.zeros(1, dtype=np.uint32) # bumped by the loop whenever the awaited set changes
+        self._pending = [] # (future, alive check, futex array, word), only touched by the loop
+        self._watch = ()   # (futex array, word) snapshot for the thread, replaced wholesale
+        loop.add_reader(self._efd, self._on_wake)
+        threading.Thread(target=self._run, name="bbos-aio-waker", daemon=True).start()
+
+    def wait(self, futex, word, alive=lambda: True):
+        """Future resolved once the futex array moves past word or alive() turns False, e.g. a reader's writer left"""
+        assert len(self._pending) < MAX_WAIT, f"more than {MAX_WAIT} futexes awaited in one event loop"
+        fut = self._loop.create_future()
+        self._pending.append((fut, alive, futex, word))
+        self._publish()
+        return fut
+
+    def _publish(self):
+        self._watch = tuple((futex, word) for fut, _, futex, word in self._pending)
+        self._ctl[0] += 1
+        futex_wake(self._ctl.ctypes.data)
+
+    def _on_wake(self):
+        try:
+            os.eventfd_read(self._efd)
+        except BlockingIOError:
+            pass
+        keep = []
+        for entry in self._pending:
+            fut, alive, futex, word = entry
+            if fut.done(): # cancelled, e.g. by asyncio.wait_for
+                continue
+            if futex[0] != word or not alive():
+                fut.set_result(None)
+            else:
+                keep.append(entry)
+        self._pending = keep
+        self._publish() # also lets the thread sleep again
+
+    def _run(self):
+        last = time.monotonic()
+        while not self._loop.is_closed():
+            ctl = int(self._ctl[0])
+            watch = self._watch
+            addrs = [self._ctl.ctypes.data] + [futex.ctypes.data for futex, _ in watch]
+            if not futex_wait_many(addrs, [ctl] + [word for _, word in watch], LIVENESS):
+                futex_wait(addrs[0], ctl, 0.001) # no futex_waitv, poll the words like wait_any
+            if self._ctl[0] != ctl: # the awaited set changed, pick it up
+                continue
+            if any(futex[0] != word for futex, word in watch) or time.monotonic() - last >= LIVENESS:
+                last = time.monotonic()
+                os.eventfd_write(self._efd, 1)
+                futex_wait(addrs[0], ctl, LIVENESS) # until the loop has taken the wakeup in
+        os.close(self._efd)
+
+
+_wakers = weakref.WeakKeyDictionary() # event loop -> _Waker
+
+
+def _waker():
+    loop = asyncio.get_running_loop()
+    w = _wakers.get(loop)
+    if w is None:
+        w = _wakers[loop] = _Waker(loop)
+    return w
+
+
+class Reader:
+    """bbos.Reader without Loop pacing, whose next() waits for the writer without blocking the event loop.
+    Everything else (data, samples, view, latest, ...) is the wrapped Reader's"""
+    def __init__(self, name, fields=None, lengths=None):
+        self._r = ipc.Reader(name, keeptime=False, fields=fields, lengths=lengths)
+
+    def __enter__(self):
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._r, name)
+
+    async def next(self):
+        """Waits for a sample not yet consumed and returns the newest, samples holds all of them for ring topics"""
+        r = self._r
+        while True:
+            if not r._alive():
+                await asyncio.sleep(POLL)
+                continue
+            word = int(r._futex[0]) # snapshot before checking the head so no publish is missed
+            if r._head[0] != r._seen:
+                r.ready()
+                if len(r.samples):
+                    return r.data
+                continue
+            r._waiting()
+            await _waker().wait(r._futex, word, r._attached)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._r.__exit__(exc_type, exc_val, exc_tb)
+
+
+class Writer:
+    """bbos.Writer without Loop pacing: buf() is an async context manager that sleeps on the event loop until the
+    topic's next deadline. Everything else (subscribers, has_readers, ...) is the wrapped Writer's"""
+    def __init__(self, name, datatype, slots=1):
+        self._w = ipc.Writer(name, datatype, keeptime=False, slots=slots)
+        _, period = datatype if isinstance(datatype, tuple) else datatype()
+        self._period = None if period is None else 1_000_000 * period
+        self._deadline = -1
+        self._overruns = 0
+        self._tfd = libc.timerfd_create(CLOCK_MONOTONIC, TFD_NONBLOCK | TFD_CLOEXEC)
+        if self._tfd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def __enter__(self):
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._w, name)
+
+    async def _sleep_until(self, deadline):
+        sim = clock()
+        if isinstance(sim, SimClock): # sim time only moves with the bag: wait for its steps as SimClock.sleep_until does
+            futex = np.frombuffer(sim._map, dtype=np.uint32, count=1)
+            while True:
+                word = int(futex[0])
+                if sim.monotonic_ns() >= deadline:
+                    return
+                await _waker().wait(futex, word)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        spec = itimerspec(timespec(0, 0), timespec(deadline // 1_000_000_000, deadline % 1_000_000_000))
+        libc.timerfd_settime(self._tfd, TFD_TIMER_ABSTIME, ctypes.byref(spec), None)
+        loop.add_reader(self._tfd, lambda: fut.done() or fut.set_result(None))
+        try:
+            await fut
+        finally:
+            loop.remove_reader(self._tfd)
+            try:
+                os.read(self._tfd, 8)
+            except BlockingIOError:
+                pass
+
+    async def _keeptime(self):
+        now = monotonic_ns()
+        if self._deadline < 0:
+            self._deadline = now
+        if self._deadline > now:
+            await self._sleep_until(self._deadline)
+            now = monotonic_ns()
+        late = max(now - self._deadline, 0)
+        if late > self._period // 10:
+            self._overruns += 1 + late // self._period
+        self._deadline += (late // self._period + 1) * self._period
+
+    @contextlib.asynccontextmanager
+    async def buf(self):
+        if self._period is not None:
+            await self._keeptime()
+        with self._w.buf() as b:
+            yield b
+
+    @property
+    def overruns(self):
+        """Publish deadlines this writer missed by more than a tenth of its period, or skipped entirely"""
+        return self._overruns
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        os.close(self._tfd)
+        return self._w.__exit__(exc_type, exc_val, exc_tb)
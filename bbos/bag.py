@@ -0,0 +1,227 @@
+"""
+Record/replay of bbos topics.
+
+A bag is a directory holding meta.json (the writer's dtype descriptor and period, once per topic) and,
+per topic, an append-only log of fixed-size records (<topic>.bin) next to an int64 index of their
+timestamps (<topic>.idx). Both are memory-mapped on playback, so seeking is a binary search.
+
+    python -m bbos.bag record <bag> camera.points localizer.pose
+    python -m bbos.bag play <bag> [--speed 2] [--start 10]
+    python -m bbos.bag info <bag>
+
+The recorder reads each topic like any other Reader: a single-slot topic only holds its newest sample, so samples
+published while the recorder is busy with other topics are lost. Give recorded topics a ring (Writer(..., slots=N)
+or the player's slots) to capture every sample; what was lost is counted per topic and reported when recording stops.
+
+With --sim the player steps the shared SimClock to each record's timestamp, so daemons started with
+BBOS_CLOCK=sim keep time with the bag and `--speed inf` replays hours of data as fast as they can consume it.
+"""
+from bbos.ipc import Reader, Writer, wait_any, json_descr_to_dtype
+from bbos.time import ns_sleep, clock, set_clock, SimClock
+
+import os, json, time, heapq, signal, argparse, contextlib
+import numpy as np
+from pathlib import Path
+
+
+def _ns(samples):
+    return samples['timestamp'].astype('datetime64[ns]').view(np.int64)
+
+
+class Recorder:
+    def __init__(self, path, topics):
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._topics = topics
+        self._meta = self._load_meta()
+        self._files = {}
+        self._last = {}
+        self._missed = {} # topic -> samples published while recording that never reached the bag
+        self._running = True
+
+    def _load_meta(self):
+        meta = self._path / "meta.json"
+        return json.loads(meta.read_text()) if meta.exists() else {}
+
+    def _open(self, topic, r):
+        lock = json.loads(r._writer_lock)
+        known = self._meta.get(topic)
+        assert known is None or known["dtype"] == lock["dtype"], f"{topic} changed dtype since it was recorded"
+        if known is None:
+            self._meta[topic] = {"dtype": lock["dtype"], "period": lock["period"]}
+            tmp = self._path / "meta.json.tmp"
+            tmp.write_text(json.dumps(self._meta))
+            os.replace(tmp, self._path / "meta.json")
+        self._files[topic] = (open(self._path / f"{topic}.bin", "ab"), open(self._path / f"{topic}.idx", "ab"))
+        self._last[topic] = np.iinfo(np.int64).min
+        if lock.get("slots", 1) == 1:
+            print(f"[-] bag: {topic} has no ring, samples published between two recorder wakeups are lost", flush=True)
+
+    def _append(self, topic, samples):
+        data, idx = self._files[topic]
+        ts = np.maximum.accumulate(np.maximum(_ns(samples), self._last[topic])) # index stays sorted
+        self._last[topic] = int(ts[-1])
+        data.write(samples.tobytes())
+        idx.write(ts.tobytes())
+
+    def stop(self):
+        self._running = False
+
+    @property
+    def missed(self):
+        """Samples per topic that were published while recording but never written to the bag"""
+        return dict(self._missed)
+
+    def run(self):
+        with contextlib.ExitStack() as stack:
+            readers = {stack.enter_context(Reader(t, keeptime=False)): t for t in self._topics}
+            try:
+                while self._running:
+                    for r in wait_any(list(readers), timeout=0.5):
+                        topic = readers[r]
+                        if r.ready() and len(r.samples):
+                            if topic not in self._files:
+                                self._open(topic, r)
+                            self._append(topic, r.samples)
+                        self._missed[topic] = r.missed
+            finally:
+                for data, idx in self._files.values():
+                    data.close()
+                    idx.close()
+                for topic, n in self._missed.items():
+                    if n:
+                        print(f"[-] bag: {topic} lost {n} samples, its writer needs (more) slots", flush=True)
+
+
+class Player:
+    def __init__(self, path, topics=None, restamp=False, slots=1):
+        """restamp publishes with the replay time instead of the recorded timestamps"""
+        self._path = Path(path)
+        meta = json.loads((self._path / "meta.json").read_text())
+        self._restamp = restamp
+        self._slots = slots
+        self._period = {}
+        self._data = {}
+        self._idx = {}
+        for topic, info in meta.items():
+            if topics is not None and topic not in topics:
+                continue
+            dtype = json_descr_to_dtype(info["dtype"])
+            count = min((self._path / f"{topic}.bin").stat().st_size // dtype.itemsize,
+                        (self._path / f"{topic}.idx").stat().st_size // 8) # drop a torn tail
+            if count == 0:
+                continue
+            self._period[topic] = info["period"]
+            self._data[topic] = np.memmap(self._path / f"{topic}.bin", dtype=dtype, mode='r', shape=(count,))
+            self._idx[topic] = np.memmap(self._path / f"{topic}.idx", dtype=np.int64, mode='r', shape=(count,))
+        self._writers = {}
+        self._stack = contextlib.ExitStack()
+        self.seek(self.start)
+
+    @property
+    def topics(self):
+        return list(self._data)
+
+    @property
+    def start(self):
+        return min((int(i[0]) for i in self._idx.values()), default=0)
+
+    @property
+    def end(self):
+        return max((int(i[-1]) for i in self._idx.values()), default=0)
+
+    def __len__(self):
+        return sum(len(i) for i in self._idx.values())
+
+    def seek(self, t_ns):
+        """Positions every topic at its first record at or after t_ns"""
+        self._queue = []
+        for topic, idx in self._idx.items():
+            i = int(np.searchsorted(idx, t_ns, side='left'))
+            if i < len(idx):
+                self._queue.append((int(idx[i]), topic, i))
+        heapq.heapify(self._queue)
+
+    def __enter__(self):
+        for topic, data in self._data.items():
+            self._writers[topic] = self._stack.enter_context(
+                Writer(topic, (data.dtype, self._period[topic]), keeptime=False, slots=self._slots))
+        return self
+
+    def _publish(self, topic, rec):
+        with self._writers[topic].buf() as b:
+            for f in rec.dtype.names:
+                if f != 'timestamp' or not self._restamp:
+                    b[f] = rec[f]
+
+    def step(self):
+        """Publishes the next record in timestamp order, returns (timestamp ns, topic) or None at the end.
+        Under a SimClock, sim time is first moved to the record's timestamp"""
+        if not self._queue:
+            return None
+        t, topic, i = heapq.heappop(self._queue)
+        sim = clock()
+        if isinstance(sim, SimClock) and t > sim.time_ns():
+            sim.set(t)
+        self._publish(topic, self._data[topic][i])
+        if i + 1 < len(self._idx[topic]):
+            heapq.heappush(self._queue, (int(self._idx[topic][i + 1]), topic, i + 1))
+        return t, topic
+
+    def play(self, speed=1.0):
+        """Replays from the current position, speed=float('inf') publishes as fast as possible"""
+        t0_bag = None
+        while self._queue:
+            t = self._queue[0][0]
+            if t0_bag is None:
+                t0_bag, t0 = t, time.monotonic_ns()
+            elif speed != float('inf'):
+                sleep_for = int((t - t0_bag) / speed) - (time.monotonic_ns() - t0)
+                if sleep_for > 0:
+                    ns_sleep(sleep_for)
+            self.step()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stack.close()
+        self._writers.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bbos.bag")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("bag")
+    rec.add_argument("topics", nargs="+")
+    play = sub.add_parser("play")
+    play.add_argument("bag")
+    play.add_argument("topics", nargs="*")
+    play.add_argument("--speed", type=float, default=1.0)
+    play.add_argument("--start", type=float, default=0.0, help="seconds from the start of the bag")
+    play.add_argument("--restamp", action="store_true")
+    play.add_argument("--sim", action="store_true", help="drive the shared sim clock (daemons run with BBOS_CLOCK=sim)")
+    info = sub.add_parser("info")
+    info.add_argument("bag")
+    args = parser.parse_args()
+
+    if args.cmd == "record":
+        recorder = Recorder(args.bag, args.topics)
+        signal.signal(signal.SIGINT, lambda *_: recorder.stop())
+        signal.signal(signal.SIGTERM, lambda *_: recorder.stop())
+        print(f"Recording {', '.join(args.topics)} to {args.bag}", flush=True)
+        recorder.run()
+    elif args.cmd == "play":
+        if args.sim:
+            set_clock(SimClock())
+        with Player(args.bag, args.topics or None, restamp=args.restamp) as player:
+            player.seek(player.start + int(args.start * 1e9))
+            player.play(args.speed)
+    else:
+        player = Player(args.bag)
+        print(f"Duration: {(player.end - player.start) / 1e9:.2f}s, {len(player)} records")
+        for topic in player.topics:
+            n = len(player._idx[topic])
+            print(f"  {topic}: {n} records, {player._data[topic].dtype.itemsize * n / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
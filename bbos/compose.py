@@ -0,0 +1,159 @@
+"""
+Several daemons in one process.
+
+    python -m bbos.compose camera depth mapping
+    python -m bbos.compose imu drive apps/foo.py
+
+Each daemon.py (or app script) runs as its own node on a thread, executed as `__main__` with its usual
+`__file__`. A node keeps its identity: the owner of its topics, its TimeLog and Loop status sockets, its
+`<daemon>_sched` profile and its Loop schedule are its own, so bbos-top and list.py show it as if it ran
+alone. Each node's schedule is shifted in phase from the others', so a reader never wakes on the same tick as
+its writer. Topics between nodes take the same-process path (no shm open or socket, see Reader), and the nodes
+share one interpreter, numpy and the constants index instead of loading them once per daemon; the index and
+constants modules load under one lock, so nodes starting together may look configs up concurrently.
+
+Modules next to a daemon.py (driver.py, madgwick.py, ...) are loaded per node, so two daemons' `driver`
+modules do not collide. A node's modules see their own `threading`, whose threads run as that node; threads
+started by libraries (bbos, numpy, drivers) are left alone. The nodes share the GIL: compose daemons
+that spend their time in I/O, sleeps and numpy/OpenCV calls, and keep hard real-time ones in their own process.
+When any node exits, or on SIGINT, every node is asked to stop and raises KeyboardInterrupt at its next
+Loop.keeptime or wait_any, as if it got SIGINT itself, and the process exits so the supervisor restarts the
+composition as a whole.
+"""
+from bbos.time import Node, Loop, bind_node
+from bbos import ipc
+
+import sys, time, types, ctypes, builtins, argparse, threading, traceback, importlib.util
+from pathlib import Path
+
+DAEMONS = Path(__file__).parent / "daemons"
+
+
+def _entry(arg):
+    """Path of the daemon.py named arg, or arg itself when it is a script"""
+    path = DAEMONS / arg / "daemon.py"
+    return path if path.is_file() else Path(arg).resolve()
+
+
+def _threading(node):
+    """threading as the node's modules see it: threads they start run as the node"""
+    class Thread(threading.Thread):
+        def start(self):
+            run = self.run
+            def _run():
+                bind_node(node)
+                run()
+            self.run = _run
+            super().start()
+
+    mod = types.ModuleType("threading", threading.__doc__)
+    mod.__dict__.update({k: v for k, v in vars(threading).items() if not k.startswith("__")})
+    mod.Thread = Thread
+    return mod
+
+
+def _importer(node, prefix):
+    """__import__ that resolves the modules next to the node's entry point to copies private to the node"""
+    here = Path(node.main).parent
+    local = {p.stem for p in here.glob("*.py") if not p.stem.startswith("_")} - {Path(node.main).stem}
+    node_builtins = dict(vars(builtins))
+    node_threading = _threading(node)
+
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name == "threading":
+            return node_threading
+        if level != 0 or name not in local:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+        key = f"{prefix}.{name}"
+        mod = sys.modules.get(key)
+        if mod is None:
+            spec = importlib.util.spec_from_file_location(key, here / f"{name}.py")
+            mod = importlib.util.module_from_spec(spec)
+            mod.__builtins__ = node_builtins
+            sys.modules[key] = mod
+            try:
+                spec.loader.exec_module(mod)
+            except BaseException:
+                del sys.modules[key]
+                raise
+        return mod
+
+    node_builtins["__import__"] = _import
+    return node_builtins
+
+
+class Composition:
+    def __init__(self, entries):
+        self.nodes = []
+        self.threads = []
+        self.done = threading.Event()
+        for path in map(_entry, entries):
+            if not path.is_file():
+                raise FileNotFoundError(f"no daemon or script {path}")
+            node = Node(path)
+            node.loop._phase = len(self.nodes) * Loop.NODE_PHASE_NS
+            self.nodes.append(node)
+
+    def _run(self, node, name):
+        bind_node(node)
+        main = Path(node.main)
+        scope = {"__name__": "__main__", "__file__": str(main),
+                 "__builtins__": _importer(node, f"bbos_node_{main.parent.name}_{main.stem}")}
+        try:
+            exec(compile(main.read_text(), str(main), "exec"), scope)
+            print(f"[-] {name} exited", flush=True)
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            print(f"[-] {name} failed", flush=True)
+            traceback.print_exc()
+        finally:
+            self.done.set()
+
+    def start(self):
+        for node in self.nodes:
+            name = f"{Path(node.main).parent.name}/{Path(node.main).stem}"
+            t = threading.Thread(target=self._run, args=(node, name), name=name, daemon=True)
+            t.start()
+            self.threads.append(t)
+            print(f"[+] compose: started {name}", flush=True)
+
+    def close(self, timeout=5.0):
+        """Asks every node to stop: each raises KeyboardInterrupt at its next Loop.keeptime or wait_any, as SIGINT
+        would in its own process, so their with-blocks and finally clauses run. A node still running after half
+        the timeout (a loop that never reaches either) gets the exception asynchronously, which lands once it
+        is back in Python code. Writers of nodes that are still stuck are closed from here"""
+        for node in self.nodes:
+            node.stopping = True
+        deadline = time.monotonic() + timeout
+        for t in self.threads:
+            t.join(max(0.0, deadline - timeout / 2 - time.monotonic()))
+        for t in self.threads:
+            if t.is_alive():
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(t.ident), ctypes.py_object(KeyboardInterrupt))
+        for t in self.threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        for w in list(ipc._local.values()):
+            bind_node(next((n for n in self.nodes if w._keeptime and hex(id(w._trigger)) in n.loop._triggers), None))
+            w.__exit__(None, None, None)
+        bind_node(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bbos.compose", description="Run several daemons in one process")
+    parser.add_argument("entries", nargs="+", help="daemon names or app scripts")
+    args = parser.parse_args()
+    comp = Composition(args.entries)
+    comp.start()
+    interrupted = False
+    try:
+        comp.done.wait()
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        comp.close()
+    sys.exit(0 if interrupted else 1) # a node ended on its own
+
+
+if __name__ == "__main__":
+    main()
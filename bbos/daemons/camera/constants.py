@@ -17,7 +17,7 @@ class stereo:
     f_x = 1500 
 
 
-@realtime(ms=70)
+@realtime(ms=70, memory=("huge", "populate"))
 def camera_jpeg(buflen):
     return [
         ("bytesused", np.uint32),
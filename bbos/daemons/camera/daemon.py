@@ -60,8 +60,9 @@ def main():
             # Dequeue buffer
             fcntl.ioctl(fd, v4l2.VIDIOC_DQBUF, buf)
             with w.buf() as b:
-                b['bytesused'] = buf.bytesused
-                b['jpeg'][:buf.bytesused] = mv[:buf.bytesused]
+                if w.should_publish():
+                    b['bytesused'] = buf.bytesused
+                    b['jpeg'][:buf.bytesused] = mv[:buf.bytesused]
     # Cleanup
     fcntl.ioctl(fd, v4l2.VIDIOC_STREAMOFF, buf_type)
     del mv
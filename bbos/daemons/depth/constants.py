@@ -17,6 +17,11 @@ class depth:
     width_D, height_D = (int(cam.width//2 * downsample), int(cam.height * downsample))
     T_base_cam = trans([0,0,1.55]) @ rot([-1,0,0], 90) @ rot([-1,0,0], 36) 
 
+@register
+class depth_sched: # see bbos/sched.py, SGBM stays off the control core
+    cpus = (0, 1, 2)
+    nice = 10
+
 @register
 class points:
     stride = 2         # Process every Nth frame to reduce CPU usage
@@ -24,14 +29,14 @@ class points:
     num_points = int(np.floor((depth.width_D * depth.height_D + stride - 1) / stride))
 
 
-@realtime(ms=100)
+@realtime(ms=100, memory=("huge", "populate"))
 def camera_depth():
     return [
         ("depth", np.uint16, (depth.height_D, depth.width_D)),
     ]
 
 
-@realtime(ms=100)
+@realtime(ms=100, memory=("huge", "populate"))
 def camera_points():
     return [
         ("num_points", np.int32),
@@ -40,7 +45,7 @@ def camera_points():
         ("img2pts", np.int32, (depth.width_D * depth.height_D,)), # indexes rectified image to get points
     ]
 
-@realtime(ms=100)
+@realtime(ms=100, memory=("huge", "populate"))
 def camera_rect():
     return [
         ("rect", np.uint8, (depth.height_D, depth.width_D, 3)),
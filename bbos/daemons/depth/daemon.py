@@ -123,7 +123,7 @@ def main():
     baseline_m = abs(P2_cam[0, 3] / P2_cam[0, 0]) / 1000.0
     fx_ds = P1_cam[0, 0] * CFG_D.downsample
 
-    with Reader('camera.jpeg') as r_jpeg, \
+    with Reader('camera.jpeg', lengths={'jpeg': 'bytesused'}) as r_jpeg, \
             Writer('camera.depth', Type("camera_depth")) as w_depth, \
             Writer('camera.rect', Type("camera_rect")) as w_rect, \
             Writer('camera.points', Type("camera_points")) as w_points:
@@ -138,11 +138,15 @@ def main():
         pts_rgb = None
         left_rect = None
         idx = None
+        # camera timestamp of the frame each output was last computed from, None until it was: an output skipped
+        # while unread is republished with the stamp of the frame it holds, never a newer one
+        rect_ts = points_ts = depth_ts = None
         t0 = time.time()
         while True:
-            if r_jpeg.ready():
+            # skip the pipeline while nobody subscribes to any output
+            if r_jpeg.ready() and (w_rect.has_readers or w_points.has_readers or w_depth.has_readers):
                 # Decode and split stereo image
-                stereo = cv2.imdecode(r_jpeg.data["jpeg"], cv2.IMREAD_COLOR)
+                stereo = cv2.imdecode(r_jpeg.data["jpeg"][:r_jpeg.data["bytesused"]], cv2.IMREAD_COLOR)
                 if stereo is not None:
                     left  = cv2.UMat(stereo[:, img_w:])
                     right = cv2.UMat(stereo[:, :img_w])
@@ -166,35 +170,41 @@ def main():
                     
                     # Convert to numpy only for depth calculation and point cloud generation
                     disp_np = disp_float.get()
-                    valid = disp_np > (CFG_D.min_disp + 0.5)
-                    denom = disp_np - CFG_D.min_disp
-                    depth_m = np.zeros_like(disp_np)
-                    mask = (denom > 0.1) & valid
                     left_rect = left_ds.get()
-                    
-                    # Ensure type checker knows these are initialised
-                    assert fx_ds is not None and baseline_m is not None, "Stereo parameters not initialised"
-                    depth_m[mask] = fx_ds * baseline_m / denom[mask]
-
-                    # Encode depth to 16-bit PNG (millimetres – preserves precision)
-                    depth_mm = np.clip(depth_m * 1000.0, 0, 65535).astype(np.uint16)
-                    pts_cam, idx = disparity_to_camera_points(disp_np, Q)
+                    rect_ts = r_jpeg.data['timestamp']
+                    if w_depth.has_readers:
+                        valid = disp_np > (CFG_D.min_disp + 0.5)
+                        denom = disp_np - CFG_D.min_disp
+                        depth_m = np.zeros_like(disp_np)
+                        mask = (denom > 0.1) & valid
+
+                        # Ensure type checker knows these are initialised
+                        assert fx_ds is not None and baseline_m is not None, "Stereo parameters not initialised"
+                        depth_m[mask] = fx_ds * baseline_m / denom[mask]
+
+                        # Encode depth to 16-bit PNG (millimetres – preserves precision)
+                        depth_mm = np.clip(depth_m * 1000.0, 0, 65535).astype(np.uint16)
+                        depth_ts = rect_ts
+                    if w_points.has_readers:
+                        pts_cam, idx = disparity_to_camera_points(disp_np, Q)
+                        pts_rgb = cv2.cvtColor(left_rect, cv2.COLOR_BGR2RGB).reshape(-1, 3)[idx]
+                        points_ts = rect_ts
             with w_rect.buf() as b:
-                if left_rect is not None:
+                if rect_ts is not None and w_rect.should_publish():
                     b['rect'] = left_rect
-                    b['timestamp'] = r_jpeg.data['timestamp']
+                    b['timestamp'] = rect_ts
 
             with w_points.buf() as b:
-                if pts_cam is not None:
+                if points_ts is not None and w_points.should_publish():
                     b['num_points'] = len(pts_cam)
                     b['points'][:len(pts_cam)] = CFG_D.T_base_cam(pts_cam)
-                    b['colors'][:len(pts_cam)] = cv2.cvtColor(left_rect, cv2.COLOR_BGR2RGB).reshape(-1, 3)[idx]
+                    b['colors'][:len(pts_cam)] = pts_rgb
                     b['img2pts'][:len(idx)] = idx
-                    b['timestamp'] = r_jpeg.data['timestamp']
+                    b['timestamp'] = points_ts
             with w_depth.buf() as b:
-                if depth_mm is not None:
+                if depth_ts is not None and w_depth.should_publish():
                     b['depth'] = depth_mm
-                    b['timestamp'] = r_jpeg.data['timestamp']
+                    b['timestamp'] = depth_ts
 
 
 if __name__ == "__main__":
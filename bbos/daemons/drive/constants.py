@@ -12,6 +12,12 @@ class drive:
     robot_width: float = 0.3275
     wheel_diam: float = 0.165
 
+@register
+class drive_sched: # see bbos/sched.py, its own core so imu frames never pre-empt it; vision only gets what it leaves
+    cpus = (2,)
+    fifo = 40
+    mlockall = True
+
 
 @register
 class odrive:
@@ -7,7 +7,7 @@ CFG_drive = Config("drive")
 CFG_odrive = Config("odrive")
 
 if __name__ == "__main__":
-    with Writer('drive.state', Type("drive_state"))   as w_state, \
+    with Writer('drive.state', Type("drive_state"), slots=16) as w_state, \
          Writer('drive.status', Type("drive_status")) as w_status, \
          Reader('drive.ctrl')                         as r_ctrl:
         od = ODriveUART(CFG_odrive)
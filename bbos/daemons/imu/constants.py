@@ -16,6 +16,12 @@ class imu:
     filter_beta: float = 0.008
     filter_zeta: float = 0
 
+@register
+class imu_sched: # see bbos/sched.py, keeps the filter loop clear of the vision pipeline
+    cpus = (3,)
+    fifo = 50
+    mlockall = True
+
 @realtime(ms=10)
 def imu_orientation():
     """Computed orientation from IMU data"""
@@ -1,4 +1,5 @@
 from bbos import Writer, Config, Type
+from bbos.time import Loop
 from driver import ICM42688P
 from madgwick import MadgwickAHRS, Quaternion
 import time
@@ -160,7 +161,8 @@ if __name__ == "__main__":
     print(f"[IMU] Daemon started - ICM42688P on I2C bus {CFG.i2c_bus} address 0x{CFG.i2c_address:02X}")
     print(f"[IMU] Sample rate: {CFG.sample_rate}Hz, Accel: ±{CFG.accel_range}g, Gyro: ±{CFG.gyro_range}dps")
 
-    with Writer('imu.orientation', Type("imu_orientation")) as w_orient:
+    Loop.precise() # filters need a steady dt, the spin stays on the core imu_sched pins it to
+    with Writer('imu.orientation', Type("imu_orientation"), slots=16) as w_orient:
         while True:
             rpy = imu.get_orientation() - ori_bias
             rpy = prev_rpy * (1 - alpha) + rpy * alpha
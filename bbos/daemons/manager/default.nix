@@ -54,6 +54,21 @@ let
     '';
   };
 
+  top = pkgs.stdenv.mkDerivation {
+    name = "bbos-top";
+    version = "1.0";
+    src = ./.;
+    nativeBuildInputs = [ makeWrapper ];
+    installPhase = ''
+      mkdir -p $out/bin
+      ln -s "$src/top.py" "$out/bin/top.py"
+
+      makeWrapper ${python}/bin/python3 $out/bin/bbos-top \
+        --add-flags "$out/bin/top.py" \
+        --set PATH ${runtimePath}
+    '';
+  };
+
 logs = pkgs.writeShellApplication {
   name = "logs";
   text = ''
@@ -155,5 +170,5 @@ stop = pkgs.writeShellApplication {
 
 in pkgs.buildEnv {
   name = "manager";
-  paths = [ manager calibrate logs restart stop list];
+  paths = [ manager calibrate logs restart stop list top];
 }
\ No newline at end of file
@@ -1,7 +1,7 @@
 import subprocess, json, socket, struct,time, concurrent.futures
 from collections import defaultdict
 
-def update_stats(writer_data, reader_data):
+def update_stats(writer_data, reader_data, loop_data=None):
     def get_data(sock: str):
         s = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
         res = s.connect_ex(f'\0{sock}')
@@ -17,23 +17,35 @@ def update_stats(writer_data, reader_data):
     # This avoids duplicates that come from multiple entries per socket (e.g., connected endpoints)
     awk_prog = 'NR>1 && $6=="01" && $NF ~ /^@.*\.bbos$/ {sub(/^@/, "", $NF); print $NF}'
     result = subprocess.run(["awk", awk_prog, "/proc/net/unix"], capture_output=True, text=True)
-    sockets = result.stdout.splitlines()
+    sockets = [sock for sock in result.stdout.splitlines() if not sock.endswith("__loop.bbos")]
+    loops = [sock for sock in result.stdout.splitlines() if sock.endswith("__loop.bbos")]
     writers = {sock.split("__")[0].replace(".bbos", "") for sock in sockets}
     def process_socket(sock):
         w = sock.split("__")[0].replace(".bbos", "")
         if "timelog" in sock:
             reader = f"{sock.split('__')[2]}/{sock.split('__')[1]}"
             data = get_data(sock)
-            return ("timelog", w, reader, struct.unpack("<qqq", data) if data else None)
+            return ("timelog", w, reader, struct.unpack(f"<{len(data) // 8}q", data) if data else None)
         else:
             data = get_data(sock)
             return ("writer", w, json.loads(data) if data else None)
 
+    def process_loop(sock):
+        # one per process, or per node of a composed process: period ms, lagging, times lagged, jitter p50-p99.9
+        node = sock[:-len("__loop.bbos")].replace("__", "/")
+        data = get_data(sock)
+        return ("loop", node, struct.unpack(f"<{len(data) // 8}q", data) if data else None)
+
     with concurrent.futures.ThreadPoolExecutor() as executor:
         results = list(executor.map(process_socket, sockets))
+        if loop_data is not None:
+            results += list(executor.map(process_loop, loops))
 
     for result in results:
-        if result[0] == "timelog":
+        if result[0] == "loop":
+            _, node, data = result
+            loop_data[node] = data
+        elif result[0] == "timelog":
             _, w, reader, data = result
             reader_data[w][reader] = data
         else:
@@ -42,9 +54,9 @@ def update_stats(writer_data, reader_data):
     return writer_data, reader_data
 
 def main():
-    writer_data, reader_data = {}, defaultdict(dict)
+    writer_data, reader_data, loop_data = {}, defaultdict(dict), {}
     print("Collecting readers and writers...", flush=True)
-    update_stats(writer_data, reader_data)
+    update_stats(writer_data, reader_data, loop_data)
     for writer, info in writer_data.items():
         print(f"Writer : {writer}")
         if not info:
@@ -54,6 +66,7 @@ def main():
         print(f"  Caller : {info['caller']}")
         print(f"  Owner  : {info['owner']}")
         print(f"  Target Period: {info['period']} ms")
+        print(f"  Slots  : {info.get('slots', 1)}")
         print("  DType  :")
         for f in info['dtype']:
             if len(f) == 3:
@@ -68,9 +81,24 @@ def main():
                 std_ms = data[1] / 1_000_000  # ns to ms
                 max_ms = data[2] / 1_000_000  # ns to ms
                 print(f"    Data : avg={avg_ms:.2f}ms, std={std_ms:.2f}ms, max={max_ms:.2f}ms")
+                if len(data) >= 11: # p50/p90/p99/p99.9 of read period and publish-to-read latency
+                    print(f"    Period  p50/p90/p99/p99.9: {'/'.join(f'{v / 1e6:.2f}' for v in data[3:7])}ms")
+                    print(f"    Latency p50/p90/p99/p99.9: {'/'.join(f'{v / 1e6:.2f}' for v in data[7:11])}ms")
+                if len(data) >= 14: # publish counter: samples skipped or overwritten, republished, newest delivered
+                    print(f"    Seq  : last={data[13]}, missed={data[11]}, duplicates={data[12]}")
             else:
                 print(f"    Data : None")
         print("-" * 40)
+    for node, data in sorted(loop_data.items()):
+        print(f"Loop   : {node}")
+        if not data:
+            print("    Data : None")
+            continue
+        print(f"    Period: {data[0]} ms, lagging={bool(data[1])}, lagged {data[2]} times")
+        if len(data) >= 7:
+            print(f"    Jitter p50/p90/p99/p99.9: {'/'.join(f'{v / 1e3:.0f}' for v in data[3:7])}us")
+    if loop_data:
+        print("-" * 40)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import os, json, mmap, time, socket, struct, curses, argparse
+
+CACHE_LINE = 64
+HEAD_OFFSET = 8 # u64 publish counter in every topic's shm header, see bbos/ipc.py
+
+
+def list_sockets():
+    """Names of the listening bbos status sockets, parsed straight from /proc/net/unix"""
+    names = set()
+    with open("/proc/net/unix") as f:
+        next(f)
+        for line in f:
+            parts = line.split()
+            if len(parts) == 8 and parts[5] == "01" and parts[7].startswith("@") and parts[7].endswith(".bbos"):
+                names.add(parts[7][1:-len(".bbos")])
+    return names
+
+
+class Conn:
+    """Persistent status connection, polled by sending a byte"""
+    def __init__(self, name):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.sock.settimeout(0.2)
+        self.sock.connect(f"\0{name}.bbos")
+        self.data = self.sock.recv(4096) or None # sent on accept, empty when nothing is logged yet
+
+    def poll(self):
+        self.sock.send(b"?")
+        self.data = self.sock.recv(4096) or None
+        return self.data
+
+    def close(self):
+        self.sock.close()
+
+
+class Topic:
+    """Writer lock plus a read-only map of the publish counter, never counted as a subscriber"""
+    def __init__(self, name):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        s.settimeout(0.2)
+        try:
+            s.connect(f"\0{name}.bbos")
+            self.lock = json.loads(s.recv(4096))
+        finally:
+            s.close()
+        fd = os.open(f"/dev/shm/{name}", os.O_RDONLY)
+        try:
+            self.ino = os.fstat(fd).st_ino
+            self.map = mmap.mmap(fd, CACHE_LINE, mmap.MAP_SHARED, mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        self.name = name
+        self.head, self.t, self.rate = self.count(), time.monotonic(), None
+
+    def count(self):
+        return struct.unpack_from("<Q", self.map, HEAD_OFFSET)[0]
+
+    def stale(self):
+        try:
+            return os.stat(f"/dev/shm/{self.name}").st_ino != self.ino
+        except FileNotFoundError:
+            return True
+
+    def sample(self):
+        head, t = self.count(), time.monotonic()
+        self.rate = (head - self.head) / (t - self.t) if t > self.t else self.rate
+        self.head, self.t = head, t
+
+    def close(self):
+        self.map.close()
+
+
+class Monitor:
+    def __init__(self):
+        self.topics = {}   # topic -> Topic
+        self.timelogs = {} # socket name -> Conn
+        self.loops = {}    # WHOAMI -> Conn
+
+    @staticmethod
+    def _sync(store, names, make):
+        for name in set(store) - names:
+            store.pop(name).close()
+        for name in names - set(store):
+            try:
+                store[name] = make(name)
+            except (OSError, ValueError):
+                pass
+
+    def _poll(self, store):
+        for name, conn in list(store.items()):
+            try:
+                conn.poll()
+            except OSError:
+                store.pop(name).close()
+
+    def refresh(self):
+        names = list_sockets()
+        timelogs = {n for n in names if n.endswith("__timelog")}
+        loops = {n[:-len("__loop")] for n in names if n.endswith("__loop")}
+        writers = names - timelogs - {f"{n}__loop" for n in loops}
+        for name in [n for n, t in self.topics.items() if t.stale()]: # writer restarted
+            self.topics.pop(name).close()
+        self._sync(self.topics, writers, Topic)
+        self._sync(self.timelogs, timelogs, Conn)
+        self._sync(self.loops, loops, lambda n: Conn(f"{n}__loop"))
+        for t in self.topics.values():
+            t.sample()
+        self._poll(self.timelogs)
+        self._poll(self.loops)
+
+    def rows(self):
+        readers = {}
+        for name, conn in self.timelogs.items():
+            parts = name.split("__")
+            # avg, std, max, then period p50/p90/p99/p99.9 and latency p50/p90/p99/p99.9 from newer readers,
+            # then missed, duplicates and last seq
+            data = struct.unpack(f"<{len(conn.data) // 8}q", conn.data) if conn.data else None
+            readers.setdefault(parts[0], []).append(("/".join(parts[1:-1]), data))
+        for name in sorted(self.topics):
+            t = self.topics[name]
+            owner = t.lock["owner"]
+            loop = self.loops.get(owner[:-len(".py")].replace("/", "__"))
+            # period ms, lagging, times lagged, then wakeup jitter p50/p90/p99/p99.9 from newer processes
+            loop = struct.unpack(f"<{len(loop.data) // 8}q", loop.data) if loop is not None and loop.data else None
+            yield t, owner, loop, sorted(readers.get(name, []))
+
+
+def _ms(ns):
+    return f"{ns / 1e6:.1f}"
+
+
+def render(monitor):
+    lines = [f"{'TOPIC':<24}{'OWNER':<26}{'TARGET':>8}{'ACTUAL':>9}{'RATE':>9}{'MB/s':>8}{'RDRS':>6}{'JIT99':>8}  FLAGS"]
+    for t, owner, loop, readers in monitor.rows():
+        period = t.lock["period"]
+        actual = 1e3 / t.rate if t.rate else None
+        flags = []
+        if loop is not None and loop[1]:
+            flags.append(f"LAG({loop[2]})")
+        if period and actual and actual > 1.2 * period:
+            flags.append("SLOW")
+        if t.rate == 0:
+            flags.append("IDLE")
+        mbps = t.rate * t.lock["itemsize"] / 1e6 if t.rate is not None and "itemsize" in t.lock else None
+        lines.append(f"{t.name:<24.24}{owner:<26.26}"
+                     f"{(str(period) + 'ms') if period else '-':>8}"
+                     f"{(f'{actual:.1f}ms') if actual else '-':>9}"
+                     f"{(f'{t.rate:.1f}Hz') if t.rate is not None else '-':>9}"
+                     f"{(f'{mbps:.2f}') if mbps is not None else '-':>8}"
+                     f"{len(readers):>6}"
+                     f"{(f'{loop[5] / 1e3:.0f}us') if loop is not None and len(loop) >= 7 else '-':>8}  {' '.join(flags)}")
+        for who, data in readers:
+            if data is None:
+                lines.append(f"  └ {who:<22.22}(no samples yet)")
+            elif len(data) >= 11:
+                lines.append(f"  └ {who:<22.22}period p50/p99 {_ms(data[3])}/{_ms(data[5])}ms  "
+                             f"latency p50/p90/p99/p99.9 {'/'.join(_ms(v) for v in data[7:11])}ms"
+                             + (f"  missed {data[11]} dup {data[12]}" if len(data) >= 14 else ""))
+            else:
+                lines.append(f"  └ {who:<22.22}period avg {_ms(data[0])}ms max {_ms(data[2])}ms")
+    return lines
+
+
+def run(stdscr, monitor, interval):
+    curses.curs_set(0)
+    stdscr.timeout(int(interval * 1000))
+    while True:
+        monitor.refresh()
+        stdscr.erase()
+        h, w = stdscr.getmaxyx()
+        header = f"bbos top  {time.strftime('%H:%M:%S')}  {len(monitor.topics)} topics  (q to quit)"
+        for y, line in enumerate([header, ""] + render(monitor)):
+            if y >= h:
+                break
+            stdscr.addnstr(y, 0, line, w - 1, curses.A_BOLD if y < 3 else 0)
+        stdscr.refresh()
+        if stdscr.getch() in (ord("q"), 27):
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bbos-top", description="Live monitor of bbos topics")
+    parser.add_argument("-n", "--interval", type=float, default=1.0, help="refresh period in seconds")
+    parser.add_argument("--once", action="store_true", help="print one snapshot without curses")
+    args = parser.parse_args()
+    monitor = Monitor()
+    if args.once:
+        monitor.refresh()
+        time.sleep(args.interval)
+        monitor.refresh()
+        print("\n".join(render(monitor)))
+        return
+    try:
+        curses.wrapper(run, monitor, args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
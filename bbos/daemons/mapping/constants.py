@@ -14,6 +14,7 @@ class mapping:
     min_logodds = miss_dec * 10
     decay_lambda = 0.5
     min_hit = 0.1
+    sync_ms = 30     # pose used for a point cloud is the one nearest its timestamp within this, localizer.pose is every 50ms
     @staticmethod
     def unpack_keys(keys: np.ndarray):
         keys = keys.astype(np.uint64).ravel()
@@ -35,7 +36,13 @@ class mapping:
         return np.clip((normalized - mapping.min_logodds/1000.0) / (mapping.max_logodds/1000.0 - mapping.min_logodds/1000.0), 0.0, 1.0)
 
 
-@realtime(ms=100)
+@register
+class mapping_sched: # see bbos/sched.py
+    cpus = (0, 1, 2)
+    nice = 10
+
+
+@realtime(ms=100, memory=("huge", "populate", "lock")) # 25MB, read whole by every subscriber
 def mapping_voxels():
     return [
         ("keys", np.uint64, (mapping.M,)),
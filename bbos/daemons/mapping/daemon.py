@@ -4,12 +4,14 @@ import pyopencl as cl
 from pathlib import Path
 import time
 import os
-from bbos import Writer, Reader, Config, Type
+from bbos import Writer, Reader, ReaderGroup, Config, Type
 os.environ['PYOPENCL_CTX'] = '0'
 CFG = Config('mapping')
 CFG_D = Config('depth')
 CFG_P = Config('points')
 CFG_L = Config('localizer')
+DIRTY_SHIFT = 9 # the kernels flag changed slots per chunk of 512, only those chunks are copied back and published
+MAX_RUNS = 256  # above this many separate dirty ranges one full copy is cheaper than many small ones
 
 def main():
     assert CFG_P.num_points % 32 == 0, "CFG_P.num_points must be a multiple of 32"
@@ -23,46 +25,68 @@ def main():
     endpoints = np.zeros((CFG_P.num_points, 4), dtype=np.float32)
     endpoints_buf = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=endpoints)
 
-    with Reader('localizer.pose') as r_pose, \
-         Reader('camera.points') as r_points, \
-         Writer('mapping.voxels', Type('mapping_voxels')) as w_voxels:
+    # paced by camera.points arrivals instead of the Loop period, each cloud placed with the pose nearest to it in time
+    with Reader('localizer.pose', keeptime=False) as r_pose, \
+         Reader('camera.points', keeptime=False, fields=('points',), lengths={'points': 'num_points'}) as r_points, \
+         Writer('mapping.voxels', Type('mapping_voxels'), keeptime=False, dirty_block=4096) as w_voxels:
 
         w_voxels._buf[0]['keys'].fill(np.uint64(0xffffffffffffffff))
         keys_buf = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=w_voxels._buf[0]['keys'])
         logodds_buf = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=w_voxels._buf[0]['logodds'])
+        dirty = np.zeros(-(-CFG.M >> DIRTY_SHIFT), dtype=np.uint8)
+        clean = np.zeros_like(dirty)
+        dirty_buf = cl.Buffer(ctx, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=dirty)
 
         # Build kernel
-        kernel_src = Path("voxel_map.cl").read_text()
+        kernel_src = (Path(__file__).parent / "voxel_map.cl").read_text()
         prg = cl.Program(ctx, kernel_src).build()
 
-        T_origin_base = CFG_L.T_origin_base({'x':0, 'y':0, 'theta':0})
-        origin = np.zeros(3)
+        sync = ReaderGroup([r_points, r_pose], slop_ms=CFG.sync_ms)
         while True:
-            if r_pose.ready():
-                T_origin_base = CFG_L.T_origin_base(r_pose.data)
-                origin = (T_origin_base @ CFG_D.T_base_cam)(np.zeros(3))
-                origins[:, :3] = origin
-            if r_points.ready():
-                endpoints[:, :3] = T_origin_base(r_points.data['points']).astype(np.float32)
-                n_valid = int(r_points.data['num_points'])
-                cl.enqueue_copy(queue, endpoints_buf, endpoints)
-                cl.enqueue_copy(queue, origins_buf, origins)
+            match = sync.next(timeout=0.2)
+            if match is None:
+                continue # no new cloud, nothing new to publish
+            points, pose = match
+            T_origin_base = CFG_L.T_origin_base(pose)
+            origins[:, :3] = (T_origin_base @ CFG_D.T_base_cam)(np.zeros(3))
+            n_valid = int(points['num_points'])
+            endpoints[:n_valid, :3] = T_origin_base(points['points'][:n_valid]).astype(np.float32)
+            cl.enqueue_copy(queue, endpoints_buf, endpoints)
+            cl.enqueue_copy(queue, origins_buf, origins)
 
-                wg = 32
-                global_size = ((n_valid + wg - 1)//wg)*wg
-                # Launch kernel
-                prg.update_logodds_hash(queue, (global_size,), (wg,),
-                                        origins_buf, endpoints_buf,
-                                        np.float32(CFG.voxel_size), np.int32(CFG.max_steps),
-                                        keys_buf, logodds_buf,
-                                        np.uint64(CFG.M),
-                                        np.int32(CFG.hit_inc), np.int32(CFG.miss_dec),
-                                        np.int32(n_valid), np.float32(CFG.decay_lambda), np.float32(CFG.min_hit))
-                prg.clamp_logodds(queue, (CFG.M,), None, logodds_buf, np.int32(CFG.min_logodds), np.int32(CFG.max_logodds))
-            # Copy results back
+            wg = 32
+            global_size = ((n_valid + wg - 1)//wg)*wg
+            # Launch kernel
+            prg.update_logodds_hash(queue, (global_size,), (wg,),
+                                    origins_buf, endpoints_buf,
+                                    np.float32(CFG.voxel_size), np.int32(CFG.max_steps),
+                                    keys_buf, logodds_buf,
+                                    np.uint64(CFG.M),
+                                    np.int32(CFG.hit_inc), np.int32(CFG.miss_dec),
+                                    np.int32(n_valid), np.float32(CFG.decay_lambda), np.float32(CFG.min_hit),
+                                    dirty_buf, np.int32(DIRTY_SHIFT))
+            prg.clamp_logodds(queue, (CFG.M,), None, logodds_buf, np.int32(CFG.min_logodds), np.int32(CFG.max_logodds),
+                              dirty_buf, np.int32(DIRTY_SHIFT))
+            # Copy results back, only when someone reads the map. The writer is event-paced (keeptime=False), so every
+            # buf() publishes and there is no skipped tick to check for
             with w_voxels.buf() as b:
-                cl.enqueue_copy(queue, b['keys'], keys_buf).wait()
-                cl.enqueue_copy(queue, b['logodds'], logodds_buf).wait()
+                if w_voxels.has_readers:
+                    cl.enqueue_copy(queue, dirty, dirty_buf).wait()
+                    chunks = np.flatnonzero(dirty)
+                    runs = np.split(chunks, np.flatnonzero(np.diff(chunks) != 1) + 1) if len(chunks) else []
+                    if len(runs) > MAX_RUNS:
+                        cl.enqueue_copy(queue, b['keys'], keys_buf)
+                        cl.enqueue_copy(queue, b['logodds'], logodds_buf)
+                        w_voxels.mark()
+                    else:
+                        for run in runs:
+                            s0, s1 = int(run[0]) << DIRTY_SHIFT, min((int(run[-1]) + 1) << DIRTY_SHIFT, CFG.M)
+                            cl.enqueue_copy(queue, b['keys'][s0:s1], keys_buf, src_offset=s0 * 8)
+                            cl.enqueue_copy(queue, b['logodds'][s0:s1], logodds_buf, src_offset=s0 * 4)
+                            w_voxels.mark('keys', s0, s1)
+                            w_voxels.mark('logodds', s0, s1)
+                    cl.enqueue_copy(queue, dirty_buf, clean)
+                    queue.finish()
 
 if __name__=="__main__":
     main()
\ No newline at end of file
@@ -31,7 +31,9 @@ __kernel void update_logodds_hash(
     const int  miss_dec,
     const int  n_valid,
     const float decay_lambda,
-    const float min_hit_scale
+    const float min_hit_scale,
+    __global uchar *dirty,  // per chunk of 1 << dirty_shift slots, set when a slot in it changes
+    const int dirty_shift
 ){
     const int gid = get_global_id(0);
     if (gid >= n_valid) return;
@@ -82,6 +84,7 @@ __kernel void update_logodds_hash(
                                             (ulong)EMPTY_KEY64, (ulong)k);
             if (prev == EMPTY_KEY64 || prev == k) {
                 atomic_add((volatile __global int*)&values[slot], (int)miss_dec);
+                dirty[slot >> dirty_shift] = 1;
                 break;
             }
         }
@@ -105,15 +108,17 @@ __kernel void update_logodds_hash(
                                             (ulong)EMPTY_KEY64, (ulong)k);
             if (prev == EMPTY_KEY64 || prev == k) {
                 atomic_add((volatile __global int*)&values[slot], (int)scaled_hit);
+                dirty[slot >> dirty_shift] = 1;
                 break;
             }
         }
     }
 }
 
-__kernel void clamp_logodds(__global int *values, const int lo, const int hi) {
+__kernel void clamp_logodds(__global int *values, const int lo, const int hi,
+                            __global uchar *dirty, const int dirty_shift) {
     const int gid = get_global_id(0);
     int v = values[gid];
-    if (v < lo) values[gid] = lo;
-    if (v > hi) values[gid] = hi;
+    if (v < lo) { values[gid] = lo; dirty[gid >> dirty_shift] = 1; }
+    if (v > hi) { values[gid] = hi; dirty[gid >> dirty_shift] = 1; }
 }
@@ -221,7 +221,7 @@ if __name__ == "__main__":
                 #print(ps0 + r_ctrl.data['pos'])
                 write_motors(port, packet, "Goal_Position", ps0 + r_ctrl.data['pos'])
                 #write_motors(port, packet, "Goal_Velocity", r_ctrl['vel'])
-            if w_state._update():
+            if w_state.should_publish():
                 ps_i = ps.copy()
                 read_motors(port, packet, "Present_Position", ps)
                 ps = ps - ps0
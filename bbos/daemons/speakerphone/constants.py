@@ -18,6 +18,7 @@ class speakerphone:
     mic_ms: int = 100
     speaker_chunk_size: int = speaker_sample_rate // 1000 * speaker_ms
     mic_chunk_size: int = mic_sample_rate // 1000 * mic_ms
+    mic_ring_ms: int = 2000 # mic blocks held for readers that fall behind, they lose audio only past this
     mic_volume: float = 1
     speaker_volume: float = 0.3
 
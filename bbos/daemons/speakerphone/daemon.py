@@ -2,6 +2,7 @@
 """
 Low‑latency full‑duplex: mic → /speakerphone.mic SHM  |  /speakerphone.speaker → loudspeaker
 Works like your original design but lets PortAudio own the timing.
+The mic topic is a ring of mic_ring_ms, so readers that consume `samples` get every block without gaps.
 """
 
 from bbos import Writer, Reader, Type, Config
@@ -64,11 +65,11 @@ def main(w_mic, r_speak):
     spk_stream.start()
     while True:
         if r_speak.ready():
-            data = r_speak.data["audio"]
-            y = (data.astype(np.float32) / 32768.0) * CFG.speaker_volume
-            y = np.clip(y, -1.0, 1.0)
-            data = (y * 32768.0).astype(np.int16)
-            spk_stream.write(data)
+            for data in r_speak.samples["audio"]: # every block since the last read, from ring writers
+                y = (data.astype(np.float32) / 32768.0) * CFG.speaker_volume
+                y = np.clip(y, -1.0, 1.0)
+                data = (y * 32768.0).astype(np.int16)
+                spk_stream.write(data)
         if not r_speak.readable:
             spk_stream.write(zeros)
     spk_stream.stop()
@@ -79,6 +80,6 @@ def main(w_mic, r_speak):
 if __name__ == "__main__":
     mic_type  = Type("speakerphone_mic")
     r_speak = Reader("speakerphone.speaker")
-    w_mic   = Writer("speakerphone.mic", mic_type, keeptime=False)
+    w_mic   = Writer("speakerphone.mic", mic_type, keeptime=False, slots=CFG.mic_ring_ms // CFG.mic_ms)
     with w_mic, r_speak:
         main(w_mic, r_speak)
\ No newline at end of file
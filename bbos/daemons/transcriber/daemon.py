@@ -41,16 +41,21 @@ def main(r_mic, w_text):
     t.start()
     i = 0
     last_enq = -1  # simple guard to avoid enqueuing every hop if you later change hop<win
+    missed = 0
     while True:
         if r_mic.ready():
-            frame = r_mic.data['audio'].flatten().astype(np.float32) / 32768.0
-            try:
-                in_q.put_nowait(frame)
-            except queue.Full:
-                try: in_q.get_nowait()
-                except queue.Empty: pass
-                in_q.put_nowait(frame)
-        if w_text._update():
+            for audio in r_mic.samples['audio']: # every block since the last read, in order
+                frame = audio.flatten().astype(np.float32) / 32768.0
+                try:
+                    in_q.put_nowait(frame)
+                except queue.Full:
+                    try: in_q.get_nowait()
+                    except queue.Empty: pass
+                    in_q.put_nowait(frame)
+            if r_mic.missed != missed:
+                print(f"[-] transcriber fell {r_mic.missed - missed} mic blocks behind", flush=True)
+                missed = r_mic.missed
+        if w_text.should_publish():
             try:
                 txt = out_q.get_nowait()
             except queue.Empty:
@@ -1,13 +1,116 @@
 from typing import List, Set
 from bbos.registry import Type 
-from bbos.time import TimeLog, Loop
+from bbos.time import TimeLog, Loop, timespec, now_ns, node_main, check_stop
+from bbos import sched, startup
 
-import os, json, inspect, contextlib, sys, traceback, ctypes, posix_ipc, atexit, mmap, time, selectors, socket
+import os, json, errno, contextlib, sys, traceback, ctypes, posix_ipc, atexit, mmap, time, select, socket, platform, hashlib
 import numpy as np
 from pathlib import Path
+from collections import deque
 import threading
 
 CACHE_LINE = 64
+FUTEX_OFFSET = 4 # u32 futex word bumped on every publish, follows the u32 seqlock
+HEAD_OFFSET = 8 # u64 publish counter
+SCHEMA_OFFSET = 16 # u64 hash of dtype, slots and period, see _schema_hash
+WAITED_OFFSET = 24 # u32 set by readers before they block on the futex, publishes only wake once it is
+SHM_DIR = "/dev/shm" # where posix_ipc segments live, a segment's inode tells a restarted one apart
+
+def _layout(itemsize, slots, block=None):
+    """Returns (size, offset of first record) of a topic segment.
+    Layout: header line | per-slot sequence table (ring topics) or per-block generation table (dirty-tracked
+    topics, see Writer.mark) | records"""
+    entries = slots if slots > 1 else (-(-itemsize // block) if block else 0)
+    table = -(-entries * 8 // CACHE_LINE) * CACHE_LINE
+    return CACHE_LINE + table + slots * itemsize, CACHE_LINE + table
+
+def _runs(idx):
+    """[(lo, hi)] covering the sorted indices idx with as few half-open ranges as possible"""
+    if len(idx) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > 1)
+    return list(zip(idx[np.r_[0, breaks + 1]].tolist(), (idx[np.r_[breaks, len(idx) - 1]] + 1).tolist()))
+
+libc = ctypes.CDLL(None, use_errno=True)
+SYS_FUTEX = {"x86_64": 202, "aarch64": 98, "armv7l": 240}.get(platform.machine())
+SYS_FUTEX_WAITV = 449
+FUTEX_WAIT, FUTEX_WAKE = 0, 1
+FUTEX2_SIZE_U32 = 0x02
+CLOCK_MONOTONIC = 1
+
+class kernel_timespec(ctypes.Structure): # 64-bit on every arch, unlike timespec on armv7l
+    _fields_ = [("tv_sec", ctypes.c_int64),
+                ("tv_nsec", ctypes.c_int64)]
+
+class futex_waitv(ctypes.Structure):
+    _fields_ = [("val", ctypes.c_uint64),
+                ("uaddr", ctypes.c_uint64),
+                ("flags", ctypes.c_uint32),
+                ("reserved", ctypes.c_uint32)]
+
+def _timespec(timeout):
+    ns = int(timeout * 1e9)
+    return timespec(ns // 1_000_000_000, ns % 1_000_000_000)
+
+def futex_wait(addr, val, timeout=None):
+    """Sleeps while the u32 at addr equals val, at most timeout seconds"""
+    if SYS_FUTEX is None:
+        time.sleep(0.001 if timeout is None else min(timeout, 0.001))
+        return
+    ts = None if timeout is None else ctypes.byref(_timespec(timeout))
+    libc.syscall(ctypes.c_long(SYS_FUTEX), ctypes.c_void_p(addr), ctypes.c_long(FUTEX_WAIT),
+                 ctypes.c_long(val), ts, None, ctypes.c_long(0))
+
+def futex_wake(addr):
+    if SYS_FUTEX is not None:
+        libc.syscall(ctypes.c_long(SYS_FUTEX), ctypes.c_void_p(addr), ctypes.c_long(FUTEX_WAKE),
+                     ctypes.c_long(0x7fffffff), None, None, ctypes.c_long(0))
+
+def futex_wait_many(addrs, vals, timeout=None):
+    """Sleeps while every u32 at addrs equals its val. False if the wait could not happen (no futex_waitv,
+    or the kernel rejected the words), callers then fall back to polling"""
+    waiters = (futex_waitv * len(addrs))(*[futex_waitv(v, a, FUTEX2_SIZE_U32, 0) for a, v in zip(addrs, vals)])
+    ts = None
+    if timeout is not None:
+        ns = int((time.clock_gettime(time.CLOCK_MONOTONIC) + timeout) * 1e9)
+        ts = ctypes.byref(kernel_timespec(ns // 1_000_000_000, ns % 1_000_000_000))
+    res = libc.syscall(ctypes.c_long(SYS_FUTEX_WAITV), waiters, ctypes.c_long(len(addrs)),
+                       ctypes.c_long(0), ts, ctypes.c_long(CLOCK_MONOTONIC))
+    return res >= 0 or ctypes.get_errno() in (errno.EAGAIN, errno.ETIMEDOUT, errno.EINTR)
+
+MEMORY = ("huge", "populate", "lock") # allocation policies a Type can opt its topics into, see _advise and _pin
+THP_SHMEM = "/sys/kernel/mm/transparent_hugepage/shmem_enabled"
+
+def _huge(mapfile):
+    """Backs the mapping with transparent huge pages, which shm only gets when shmem_enabled allows it"""
+    try:
+        with open(THP_SHMEM) as f:
+            mode = f.read().split("[")[1].split("]")[0]
+    except (OSError, IndexError):
+        mode = "unsupported"
+    if mode not in ("always", "within_size", "advise"):
+        raise OSError(0, f"shmem_enabled is {mode}")
+    mapfile.madvise(mmap.MADV_HUGEPAGE)
+
+def _advise(mapfile, memory):
+    """First half of a memory policy, applied before the mapping is first touched. Returns [(policy, ok, error)]"""
+    report = []
+    if "huge" in memory:
+        sched._set(report, "huge", lambda: _huge(mapfile))
+    return report
+
+def _pin(mapfile, size, memory, touched):
+    """Second half of a memory policy: prefaults the mapping (unless the caller already touched every page)
+    and locks it in RAM. Returns [(policy, ok, error)], failures leave plain demand-paged memory"""
+    report = []
+    if "populate" in memory and not touched: # one read per page, works on every kernel and keeps huge pages
+        sched._set(report, "populate", lambda: np.frombuffer(mapfile, np.uint8, size)[::mmap.PAGESIZE].max())
+    elif "populate" in memory:
+        report.append(("populate", True, None))
+    if "lock" in memory:
+        addr = np.frombuffer(mapfile, np.uint8, size).ctypes.data
+        sched._set(report, "lock", lambda: sched._check(libc.mlock(ctypes.c_void_p(addr), ctypes.c_size_t(size))))
+    return report
 
 def is_socket_closed(sock: socket.socket) -> bool:
     try:
@@ -40,56 +143,123 @@ class Status:
                     data = self._srv.recv(1024)
                     details = json.loads(data)
                     print(f"Writer for {name} already exists @ {details['caller']}", flush=True)
-                except socket.timeout:
+                except (socket.timeout, ValueError): # still setting up, or not a writer
                     pass
             self._srv.close()
             sys.exit(1)
         self._srv.listen()
         self._srv.setblocking(False)
-        self._sel = selectors.DefaultSelector()
-        self._sel.register(self._srv, selectors.EVENT_READ)
         self._clients = set()
+        StatusService.get().add(self)
     @staticmethod
     def name2socket(name):
         return f"\0{name}.bbos"
     def update(self, data=None):
-        if data is None:
-            data = self._data
-            assert data is not None, "No data to update!"
-        try:
-            for key, _ in self._sel.select(timeout=0):
-                if key.fileobj is self._srv:
-                    c, _ = self._srv.accept()
-                    c.sendall(data)
-                    c.setblocking(False)
-                    self._clients.add(c)
-            remove = set() 
-            for c in self._clients:
-                try:
-                    if not c.recv(1, socket.MSG_DONTWAIT):
-                        remove.add(c)
-                except BlockingIOError:
-                    pass
-                except OSError:
-                    remove.add(c)
-            self._clients -= remove
-        except Exception as e:
-            print(e)
+        """Sets the payload sent to new clients, sockets themselves are serviced by StatusService"""
+        if data is not None:
+            self._data = data
+    @property
+    def clients(self):
+        return len(self._clients)
+
     def close(self):
+        StatusService.get().remove(self)
         self._srv.close()
-        self._sel.close()
         for c in self._clients:
             c.close()
         self._clients.clear()
 
+
+class StatusService:
+    """One epoll thread per process that accepts and reaps the clients of every Status,
+    so publishing never makes a socket syscall"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._pid = os.getpid()
+        self._ep = select.epoll()
+        self._fds = {} # fd -> (status, socket)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="bbos-status")
+        self._thread.start()
+
+    @classmethod
+    def get(cls):
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance._pid != os.getpid(): # fresh service after fork
+                cls._instance = StatusService()
+            return cls._instance
+
+    def add(self, status):
+        with self._lock:
+            self._fds[status._srv.fileno()] = (status, status._srv)
+            self._ep.register(status._srv.fileno(), select.EPOLLIN)
+
+    def remove(self, status):
+        with self._lock:
+            for c in [status._srv, *status._clients]:
+                if self._fds.pop(c.fileno(), None) is not None:
+                    self._ep.unregister(c.fileno())
+
+    def _drop(self, status, c):
+        self._fds.pop(c.fileno(), None)
+        self._ep.unregister(c.fileno())
+        status._clients.discard(c)
+        c.close()
+
+    def _run(self):
+        while True:
+            events = self._ep.poll()
+            with self._lock:
+                for fd, ev in events:
+                    if fd not in self._fds:
+                        continue
+                    status, sock = self._fds[fd]
+                    try:
+                        if sock is status._srv:
+                            c, _ = sock.accept()
+                            if status._data is None: # nothing to report yet
+                                c.close()
+                                continue
+                            c.sendall(status._data)
+                            c.setblocking(False)
+                            status._clients.add(c)
+                            self._fds[c.fileno()] = (status, c)
+                            self._ep.register(c.fileno(), select.EPOLLIN | select.EPOLLRDHUP)
+                        elif not sock.recv(16, socket.MSG_DONTWAIT) or ev & (select.EPOLLHUP | select.EPOLLERR):
+                            self._drop(status, sock)
+                        else: # persistent clients poll by sending a byte
+                            sock.send(status._data)
+                    except BlockingIOError:
+                        pass
+                    except OSError:
+                        if sock is not status._srv:
+                            self._drop(status, sock)
+
+_WRAPPERS = ("bbos.aio",) # modules whose Writers wrap this one, the caller is whoever created the wrapper
+
 def _caller_signature():
-    f = inspect.stack()[2]
-    return f"{os.path.abspath(f.filename)}:{f.lineno}"
+    f = sys._getframe(2)
+    while f.f_back is not None and f.f_globals.get("__name__") in _WRAPPERS:
+        f = f.f_back
+    return f"{os.path.abspath(f.f_code.co_filename)}:{f.f_lineno}"
 
-def _encode_lock(sig, dtype, period):
-    owner = Path(sys.modules['__main__'].__file__)
+def _encode_lock(sig, dtype, period, slots, schema, memory, block):
+    owner = Path(node_main())
     owner = owner.parent.name + '/' + owner.name # TODO: assumes name of app or daemon filename or directory of file
-    return json.dumps({"caller": sig, "dtype": dtype.descr, "period": period, "owner": owner}).encode()
+    return json.dumps({"caller": sig, "dtype": dtype.descr, "itemsize": dtype.itemsize, "period": period, "owner": owner, "slots": slots,
+                       "schema": f"{schema:016x}", "memory": list(memory),
+                       "dirty_block": block}).encode()
+
+def _schema_hash(dtype, slots, period, block=None):
+    """Nonzero u64 identifying a topic's layout, 0 in the header means a writer from before schema hashing"""
+    digest = hashlib.blake2b(json.dumps([dtype.descr, slots, period] + ([block] if block else [])).encode(),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+_schemas = {} # schema hash -> (dtype, slots, period, memory, dirty block), shared by every Writer and Reader in the process
+_local = {} # topic -> open Writer of this process, which same-process Readers attach to without shm or sockets
 
 
 def json_descr_to_dtype(desc):
@@ -113,28 +283,37 @@ def json_descr_to_dtype(desc):
 
 
 class Writer:
-    def __init__(self, name, datatype: Type | List[tuple], keeptime=True):
-        shmtype, period = datatype if isinstance(datatype, tuple) else datatype()
+    def __init__(self, name, datatype: Type | List[tuple], keeptime=True, slots=1, memory=None, dirty_block=None):
+        """slots > 1 publishes into a ring so readers can catch up on every sample they missed.
+        memory overrides the Type's allocation policy, any of MEMORY: "huge" transparent huge pages, "populate"
+        prefaulted pages, "lock" mlock'ed pages. Writer and readers each apply it to their mapping and fall back
+        to normal pages where it cannot take effect.
+        dirty_block tracks changes in blocks of that many bytes: a publish only changes what mark() was given,
+        and whole-record readers patch their previous copy with those blocks instead of copying the record"""
+        assert slots >= 1 and isinstance(slots, int)
+        assert dirty_block is None or (slots == 1 and dirty_block > 0), "dirty tracking needs a single-slot topic"
+        t0 = time.monotonic_ns()
+        sched.apply()
+        spec = datatype if isinstance(datatype, tuple) else datatype()
+        shmtype, period = spec
+        memory = tuple(getattr(spec, "memory", ()) if memory is None else memory)
+        assert set(memory) <= set(MEMORY), f"unknown memory policy {set(memory) - set(MEMORY)}, expected {MEMORY}"
         shmdtype = np.dtype(shmtype)
-        size = shmdtype.itemsize + CACHE_LINE
+        size, offset = _layout(shmdtype.itemsize, slots, dirty_block)
         sig = _caller_signature()
-        self._lock: bytes = _encode_lock(sig, shmdtype, period)
+        schema = _schema_hash(shmdtype, slots, period, dirty_block)
+        _schemas[schema] = (shmdtype, slots, period, memory, dirty_block)
+        self._schema = schema
+        self._local_readers = 0
+        self._thread = threading.get_ident()
+        self._scratch = None # record handed out by buf() on ticks that do not publish
+        self._lock: bytes = _encode_lock(sig, shmdtype, period, slots, schema, memory, dirty_block)
         assert len(self._lock) <= Status.PAYLOAD_SIZE, "Lock is too large! Increase PAYLOAD_SIZE or reconfigure your Type"
-        self._status = Status(name, self._lock)
+        self._status = Status(name) # claims the name, readers get the lock once the header below is written
         self._name = name
         self._keeptime = keeptime
         if period is None:
             self._keeptime = False
-            self._status_thread_stop = threading.Event()
-            def _status_loop():
-                while not self._status_thread_stop.is_set():
-                    self._status.update()
-                    time.sleep(0.01)
-            self._status_thread = threading.Thread(
-                target=_status_loop,
-                daemon=True
-            )
-            self._status_thread.start()
         if self._keeptime:
             # set loop trigger
             self._trigger = [0] # mutable counter
@@ -149,14 +328,35 @@ class Writer:
             size=size)
         self._mapfile = mmap.mmap(self._shm.fd, size, mmap.MAP_SHARED,
                                   mmap.PROT_READ | mmap.PROT_WRITE)
-        self._mapfile.write(b'\x00' * shmdtype.itemsize)
+        report = _advise(self._mapfile, memory)
+        self._mapfile.write(b'\x00' * size)
         self._mapfile.flush()
+        if memory:
+            sched._print_report("memory", name, report + _pin(self._mapfile, size, memory, touched=True))
         self._seq = ctypes.c_uint32.from_buffer(self._mapfile, 0)
         self._seq.value = 0
-        self._buf = np.ndarray(1,
+        self._futex = ctypes.c_uint32.from_buffer(self._mapfile, FUTEX_OFFSET)
+        self._head = ctypes.c_uint64.from_buffer(self._mapfile, HEAD_OFFSET)
+        self._head.value = 0
+        self._waited = ctypes.c_uint32.from_buffer(self._mapfile, WAITED_OFFSET)
+        self._mapfile[SCHEMA_OFFSET:SCHEMA_OFFSET+8] = schema.to_bytes(8, "little")
+        self._slots = slots
+        self._slot_seq = np.ndarray(slots,
+                                    dtype=np.uint64,
+                                    buffer=memoryview(self._mapfile)[CACHE_LINE:offset]) if slots > 1 else None
+        self._buf = np.ndarray(slots,
                                dtype=shmdtype,
-                               buffer=memoryview(self._mapfile)[CACHE_LINE:])
+                               buffer=memoryview(self._mapfile)[offset:])
+        self._block = dirty_block
+        if dirty_block:
+            self._gens = np.ndarray(-(-shmdtype.itemsize // dirty_block), dtype=np.uint64,
+                                    buffer=memoryview(self._mapfile)[CACHE_LINE:offset]) # head that last wrote each block
+            self._marks = np.zeros(len(self._gens), dtype=bool)
+            self._stamp = self._span('timestamp') # rewritten by every publish
         self._shm.close_fd()
+        self._status.update(self._lock)
+        _local[name] = self
+        startup.add("ipc_setup", t0)
 
     def __enter__(self):
         return self
@@ -167,26 +367,90 @@ class Writer:
         else:
             return True
 
+    def should_publish(self):
+        """Whether the current tick publishes. Inside a buf() block, False means the block fills a scratch record
+        that is thrown away, so expensive fills can be skipped"""
+        return self._update()
+
+    def _begin(self):
+        """Marks the next slot dirty and returns it, holding the last published record"""
+        n = self._head.value
+        slot = n % self._slots
+        self._seq.value += 1  # mark as dirty (odd)
+        if self._slots > 1:
+            self._slot_seq[slot] = 2 * n + 1  # odd → readers skip this slot
+            self._buf[slot] = self._buf[(n - 1) % self._slots]
+        self._buf[slot]['timestamp'] = np.datetime64(now_ns(), 'ns')
+        return self._buf[slot]
+
+    def _span(self, field=None, start=0, stop=None):
+        """Dirty blocks [lo, hi) holding elements [start, stop) along the first axis of field, all of them for None"""
+        if field is None:
+            return 0, len(self._gens)
+        dt, offset = self._buf.dtype.fields[field][:2]
+        n = dt.shape[0] if dt.shape else 1
+        stop = n if stop is None else stop
+        step = dt.itemsize // n
+        lo, hi = offset + start * step, offset + stop * step
+        return lo // self._block, -(-hi // self._block)
+
+    def mark(self, field=None, start=0, stop=None):
+        """Records that the sample being published changed elements [start, stop) along the first axis of field,
+        the whole record for None. Only for writers with dirty_block, which publish nothing else"""
+        lo, hi = self._span(field, start, stop)
+        self._marks[lo:hi] = True
+
+    def _end(self):
+        n = self._head.value
+        if self._slots > 1:
+            self._slot_seq[n % self._slots] = 2 * n + 2  # even → slot holds sample n
+        elif self._block:
+            self._marks[slice(*self._stamp)] = True
+            self._gens[self._marks] = n + 1
+            self._marks[:] = False
+        self._head.value = n + 1
+        self._seq.value += 1  # mark as published (even)
+        self._futex.value += 1
+        if self._waited.value: # topics only read by ready() never make a syscall here
+            futex_wake(ctypes.addressof(self._futex))
+        if startup.PENDING:
+            startup.published(self._name)
+
     @contextlib.contextmanager
     def buf(self):
-        self._status.update()
-        self._seq.value += 1  # mark as dirty (odd)
-        try:
-            if self._update():
-                self._buf[0]['timestamp'] = np.datetime64(time.time_ns(), 'ns')
-            yield self._buf[0] if self._update() else np.zeros_like(self._buf[0])
-        finally:
-            self._seq.value += 1  # mark as published (even)
+        if self._update():
+            b = self._begin()
+            try:
+                yield b
+            finally:
+                self._end()
+        else:
+            if self._scratch is None: # allocated once, its pages only get mapped where a skipped fill writes
+                self._scratch = np.zeros(1, dtype=self._buf.dtype)[0]
+            yield self._scratch
         if self._keeptime:
             Loop.keeptime()
 
+    @property
+    def subscribers(self):
+        """Number of connected readers, kept current by StatusService, plus readers in this process"""
+        return self._status.clients + self._local_readers
+
+    @property
+    def has_readers(self):
+        return self.subscribers > 0
+
+    @property
+    def overruns(self):
+        """Publish deadlines this writer missed, see Loop.overruns"""
+        return Loop.overruns(self._trigger) if self._keeptime else 0
+
     def __setitem__(self, idx, data):
-        self._status.update()
         if self._update():
-            self._seq.value += 1  # odd → readers ignore
-            self._buf[0]['timestamp'] = np.datetime64(time.time_ns(), 'ns') 
-            self._buf[0][idx] = data
-            self._seq.value += 1  # even → publish
+            self._begin()[idx] = data
+            if self._block:
+                self.mark(idx if isinstance(idx, str) else None)
+            self._end()
         if self._keeptime:
             Loop.keeptime()
 
@@ -194,13 +458,11 @@ class Writer:
         if exc_type is not None:
             print(f"Writer {self._name} exited with exception", flush=True)
             traceback.print_exception(exc_type, exc_val, exc_tb)
+        if _local.get(self._name) is self:
+            del _local[self._name]
         try:
             if self._keeptime:
                 Loop.remove(self._trigger)
-            else:
-                time.sleep(0.1)
-                self._status_thread_stop.set()
-                self._status_thread.join()
             self._shm.unlink()
             self._status.close()
         except:
@@ -209,17 +471,36 @@ class Writer:
 
 
 class Reader:
-    def __init__(self, name, keeptime=True):
+    def __init__(self, name, keeptime=True, fields=None, lengths=None, borrow=False):
+        """fields limits what ready() copies into data (timestamp is always kept), the rest stays reachable through view().
+        lengths maps an array field to the count field holding its used length, e.g. {'jpeg': 'bytesused'},
+        so only that prefix is copied and the rest of the array is left undefined.
+        borrow lets a whole-record reader of a writer on its own thread take the writer's record instead of a copy:
+        data is then read-only and changes in place on the writer's next publish"""
+        sched.apply()
         self._name = name
+        self._by_reference = borrow
+        self._fields = fields
+        self._lengths = lengths or {}
         self._readable = False
         self._valid = False
         self._tlog = TimeLog(name)
         self._data = None
+        self._snaps = None # two copies patched in turn from a dirty-tracked writer, see _patch
+        self._samples = None
+        self._slots = 1
+        self._missed = 0
+        self._duplicates = 0
+        self._last_seq = -1 # publish count of the newest sample delivered, -1 until one from the current writer
+        self._last_stamp = np.datetime64(0, 'ns')
         self._keeptime = keeptime
         if keeptime:
             self._trigger = [0] # mutable counter
             Loop.init(self._trigger)
         self._writer_lock = None
+        self._schema = None
+        self._local = None # same-process Writer this reader shares buffers with
+        self._ino = None # inode of the shm segment mapped through the socket path
         self._s = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
 
     def __enter__(self):
@@ -231,56 +512,221 @@ class Reader:
         else:
             return True
 
-    def ready(self):
-        if not self._readable or is_socket_closed(self._s): # enters when writer is closed
-            self._s = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
-            res = self._s.connect_ex(Status.name2socket(self._name))
-            if res == 0:
-                try: # antipattern: remove all these try catches
-                    self._writer_lock = self._s.recv(Status.PAYLOAD_SIZE)
-                except OSError as e:
-                    self._readable = False
-                    if self._keeptime:
-                        Loop.keeptime()
-                    return False
-            else:
+    def _connect(self):
+        t0 = time.monotonic_ns()
+        self._detach()
+        w = _local.get(self._name)
+        if w is not None: # writer lives in this process: share its mapping, no socket, shm open or JSON
+            self._local = w
+            self._ino = None
+            w._local_readers += 1
+            self._writer_lock = w._lock
+            schema = w._schema
+            shmdtype, slots, period, _, block = _schemas[schema]
+            return self._map(w._mapfile, schema, shmdtype, slots, period, block, t0)
+        self._s.close()
+        self._s = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        res = self._s.connect_ex(Status.name2socket(self._name))
+        if res == 0:
+            try: # antipattern: remove all these try catches
+                self._writer_lock = self._s.recv(Status.PAYLOAD_SIZE)
+            except OSError as e:
                 self._readable = False
-                if self._keeptime:
-                    Loop.keeptime()
                 return False
-            try:
-                lock = json.loads(self._writer_lock)
-                shmdtype = np.dtype(json_descr_to_dtype(lock["dtype"]))
-                if self._keeptime:
-                    self._trigger[0] = 0
-                    Loop.set_ms(lock["period"], self._trigger)
-                self._readable = True
-                size = shmdtype.itemsize + CACHE_LINE
-                self._shm = posix_ipc.SharedMemory(self._name)
-                self._mapfile = mmap.mmap(self._shm.fd, size, mmap.MAP_SHARED,
-                                        mmap.PROT_READ)
-                self._seq = memoryview(self._mapfile)[:4].cast('I')
-                self._buf = np.ndarray(1,
-                                    dtype=shmdtype,
-                                    buffer=memoryview(self._mapfile)[CACHE_LINE:])
-                self._data = np.zeros_like(self._buf)[0]
-                self._shm.close_fd()
-            except Exception as e:
+            if not self._writer_lock: # writer still initializing its segment, it hangs up until the header is written
                 self._readable = False
+                return False
+        else:
+            self._readable = False
+            return False
+        if self._remapped():
+            shmdtype, slots, period, _, block = _schemas[self._schema]
+            return self._map(self._mapfile, self._schema, shmdtype, slots, period, block, t0)
+        try:
+            self._shm = posix_ipc.SharedMemory(self._name)
+            schema = int.from_bytes(os.pread(self._shm.fd, 8, SCHEMA_OFFSET), "little")
+            known = _schemas.get(schema)
+            if known is None: # first time this process sees the schema, or an old writer without one
+                lock = json.loads(self._writer_lock)
+                known = (np.dtype(json_descr_to_dtype(lock["dtype"])), lock.get("slots", 1), lock["period"],
+                         tuple(lock.get("memory", ())), lock.get("dirty_block"))
+                if schema:
+                    _schemas[schema] = known
+            shmdtype, slots, period, memory, block = known
+            size = _layout(shmdtype.itemsize, slots, block)[0]
+            mapfile = mmap.mmap(self._shm.fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE) # see _waiting
+            self._ino = os.fstat(self._shm.fd).st_ino
+            self._shm.close_fd()
+            report = _advise(mapfile, memory) + _pin(mapfile, size, memory, touched=False)
+            if not all(ok for _, ok, _ in report):
+                sched._print_report("memory", self._name, report)
+        except Exception as e:
+            self._readable = False
+            return False
+        return self._map(mapfile, schema, shmdtype, slots, period, block, t0)
+
+    def _remapped(self):
+        """Whether the segment mapped last time is still the one under the topic's name, with the same schema in
+        its header (a writer that crashed and came back), so reconnecting needs no shm open or mmap"""
+        if self._ino is None or not self._schema:
+            return False
+        try:
+            if os.stat(f"{SHM_DIR}/{self._name}").st_ino != self._ino:
+                return False
+        except OSError:
+            return False
+        return int.from_bytes(self._mapfile[SCHEMA_OFFSET:SCHEMA_OFFSET+8], "little") == self._schema
+
+    def _map(self, mapfile, schema, shmdtype, slots, period, block, t0):
+        try:
+            self._slots = slots
+            if self._schema is not None and schema != self._schema:
+                print(f"[!] {self._name} changed schema, was {self._schema:016x} now {schema:016x}", flush=True)
+            if self._keeptime:
+                self._trigger[0] = 0
+                Loop.set_ms(period, self._trigger)
+            self._readable = True
+            offset = _layout(shmdtype.itemsize, self._slots, block)[1]
+            self._mapfile = mapfile
+            self._seq = memoryview(self._mapfile)[:4].cast('I')
+            self._head = memoryview(self._mapfile)[HEAD_OFFSET:HEAD_OFFSET+8].cast('Q')
+            self._futex = np.ndarray(1,
+                                     dtype=np.uint32,
+                                     buffer=memoryview(self._mapfile)[FUTEX_OFFSET:FUTEX_OFFSET+4])
+            self._waited = np.ndarray(1,
+                                      dtype=np.uint32,
+                                      buffer=memoryview(self._mapfile)[WAITED_OFFSET:WAITED_OFFSET+4])
+            self._seen = 0
+            self._slot_seq = np.ndarray(self._slots,
+                                        dtype=np.uint64,
+                                        buffer=memoryview(self._mapfile)[CACHE_LINE:offset]) if self._slots > 1 else None
+            self._buf = np.ndarray(self._slots,
+                                dtype=shmdtype,
+                                buffer=memoryview(self._mapfile)[offset:])
+            if schema == 0 or schema != self._schema: # a restarted writer with the same schema keeps our buffers
+                if self._fields is None and not self._lengths:
+                    self._out = shmdtype
+                else:
+                    names = shmdtype.names if self._fields is None else [*self._fields, 'timestamp']
+                    names = dict.fromkeys([*self._lengths.values(), *names]) # counts are copied before the arrays they bound
+                    self._out = np.dtype([(f, shmdtype.fields[f][0]) for f in names])
+                self._data = np.zeros(1, dtype=self._out)[0]
+                self._samples = np.empty(0, dtype=self._out)
+            self._buf.flags.writeable = False # the mapping is writable for _waiting, readers still get read-only records
+            # a borrowing whole-record reader on the writer's own thread is handed the record by reference, readers
+            # on other threads (composed nodes) keep the seqlock copy since the writer may publish mid-read
+            self._shared = self._buf if (self._by_reference and self._local is not None
+                                         and self._local._thread == threading.get_ident()
+                                         and self._slots == 1 and self._fields is None and not self._lengths) else None
+            # a whole-record reader of a dirty-tracked writer patches the snapshot it does not currently expose
+            # with the blocks that changed since that one was taken, then exposes it
+            self._block = block if self._slots == 1 and self._out is shmdtype else None
+            if self._block:
+                self._gens = np.ndarray(-(-shmdtype.itemsize // block), dtype=np.uint64,
+                                        buffer=memoryview(self._mapfile)[CACHE_LINE:offset])
+                if schema != self._schema or self._snaps is None:
+                    self._snaps = [np.zeros(1, dtype=shmdtype), np.zeros(1, dtype=shmdtype)]
+                    self._front = 0
+                self._snap_gens = [-1, -1] # head each snapshot was taken at, none yet
+            self._schema = schema
+            self._cursor = -1 # the first read after connecting takes whatever the ring still holds
+            self._last_seq = -1
+            self._last_stamp = np.datetime64(0, 'ns') # a new writer's clock may be behind the old one's (bag replay)
+            startup.add("ipc_setup", t0)
+        except Exception as e:
+            self._readable = False
+            return False
+        return True
+
+    def ready(self):
+        if not self._readable or not self._attached(): # enters when writer is closed
+            if not self._connect():
                 if self._keeptime:
                     Loop.keeptime()
                 return False
-        data = self._read()
-        stale = data['timestamp'] == self._data['timestamp']
-        self._data = data
+        if self._slots > 1:
+            stale = not self._read_ring()
+            self._seen = self._cursor
+        elif self._head[0] == self._last_seq: # nothing published since the last sample, skip the copy
+            stale = True
+        elif self._shared is not None: # same-process writer, its publish counter is the generation
+            self._seen = int(self._head[0])
+            self._data = self._shared[0]
+            stale = not self._fresh(self._seen, self._data['timestamp'])
+            self._samples = self._shared
+        elif self._block:
+            self._front = 1 - self._front
+            self._patch(self._front)
+            self._samples = self._snaps[self._front]
+            self._data = self._samples[0]
+            stale = not self._fresh(self._seen, self._data['timestamp'])
+        else:
+            self._data, self._seen = self._read()
+            stale = not self._fresh(self._seen, self._data['timestamp'])
+            self._samples = np.asarray(self._data).reshape(1)
+        if stale and self._slots == 1:
+            self._samples = np.empty(0, dtype=self._out)
         if not stale:
-            self._tlog.log()
+            self._tlog.log(now_ns() - self._samples['timestamp'].view(np.int64),
+                           (self._missed, self._duplicates, self._last_seq))
         if self._keeptime:
             Loop.keeptime()
         return not self._keeptime or not stale
 
+    def _attached(self):
+        if self._local is not None:
+            return _local.get(self._name) is self._local
+        return not is_socket_closed(self._s)
+
+    def _detach(self):
+        if self._local is not None:
+            self._local._local_readers -= 1
+            self._local = None
+
+    def _alive(self):
+        return (self._readable and self._attached()) or self._connect()
+
+    def wait(self, timeout=None):
+        """Blocks until the writer publishes a sample not yet consumed by ready(), False on timeout"""
+        return bool(wait_any([self], timeout))
+
+    def _waiting(self):
+        """Called before blocking on the futex: from then on the writer wakes it on every publish. The word stays
+        set for the segment's life (a count would need atomics across processes), and a writer that restarts
+        into the segment clears it, so a reader asleep through that is woken by its timeout and sets it again"""
+        if not self._waited[0]:
+            self._waited[0] = 1
+
+    def _fresh(self, seq, stamp):
+        """Books the single-slot sample the writer published as its seq-th: whether it is new to this reader,
+        counting the samples skipped since the last one. A publish that repeats the previous sample's timestamp
+        (a writer republishing the same data, like depth between camera frames) is a duplicate and not new"""
+        if seq == 0: # nothing published yet, the record is zeros
+            return False
+        if self._last_seq >= 0:
+            self._missed += max(seq - self._last_seq - 1, 0)
+        self._last_seq = seq
+        if stamp == self._last_stamp:
+            self._duplicates += 1
+            return False
+        self._last_stamp = stamp
+        return True
+
+    def _copy(self, out, i, rec):
+        if self._out is self._buf.dtype:
+            out[i] = rec
+            return
+        dst = out[i]
+        for f in self._out.names:
+            if f in self._lengths:
+                n = max(0, int(dst[self._lengths[f]]))
+                dst[f][:n] = rec[f][:n]
+            else:
+                dst[f] = rec[f]
+
     def _read(self):
-        """Guarantees a good read"""
+        """Guarantees a good read, returns the record and the publish count it was copied at"""
+        out = np.empty(1, dtype=self._out)
         while True:
             s0 = self._seq[0]
             if s0 & 1:          # writer busy → spin
@@ -289,12 +735,144 @@ class Reader:
             s1 = self._seq[0]   # re‑read before copy
             if s1 != s0:        # writer slipped in
                 continue
-            data = self._buf[0].copy()
+            head = int(self._head[0]) # moved only inside the writer's odd window
+            self._copy(out, 0, self._buf[0])
             if self._seq[0] == s0:       # still identical & even → success
-                return data
+                return out[0], head
+
+    def _patch(self, i):
+        """Brings snapshot i up to date, copying only the blocks published since it was taken"""
+        dst, src, b = self._snaps[i].view(np.uint8), self._buf.view(np.uint8), self._block
+        gen = self._snap_gens[i]
+        while True:
+            s0 = self._seq[0]
+            if s0 & 1:
+                time.sleep(0)
+                continue
+            head = int(self._head[0])
+            if gen < 0 or head < gen: # first read, or the writer restarted
+                dst[:] = src
+            else: # a torn pass is redone from the same generation, so it recopies whatever it tore
+                for lo, hi in _runs(np.flatnonzero(self._gens > gen)):
+                    dst[lo * b:hi * b] = src[lo * b:hi * b]
+            if self._seq[0] == s0:
+                self._snap_gens[i] = self._seen = head
+                return
+
+    def _borrow(self):
+        """Returns the newest record in place and a check that it was not republished since"""
+        while True:
+            if self._slots == 1:
+                s0 = self._seq[0]
+                if s0 & 1:
+                    time.sleep(0)
+                    continue
+                return self._buf[0], lambda: self._seq[0] == s0
+            n = max(int(self._head[0]), 1) - 1
+            slot = n % self._slots
+            s0 = self._slot_seq[slot]
+            if s0 & 1 or (s0 != 2 * n + 2 and self._head[0] != 0):
+                time.sleep(0)
+                continue
+            return self._buf[slot], lambda: self._slot_seq[slot] == s0
+
+    @contextlib.contextmanager
+    def view(self):
+        """Borrows the newest record without copying it. The record is read-only and only meaningful
+        inside the block: afterwards valid is False if the writer published over it meanwhile"""
+        assert self._readable, f"Reader {self._name} is not connected, call ready() first"
+        rec, check = self._borrow()
+        self._valid = False
+        try:
+            yield rec
+        finally:
+            self._valid = check()
+
+    @property
+    def valid(self):
+        """Whether the last view() block saw a consistent record"""
+        return self._valid
+
+    @property
+    def overruns(self):
+        """Read deadlines this reader missed, see Loop.overruns"""
+        return Loop.overruns(self._trigger) if self._keeptime else 0
+
+    def _read_slot(self, n, out, i):
+        """Copies sample n of a ring topic into out[i], False if the writer already overwrote it"""
+        slot = n % self._slots
+        s0 = self._slot_seq[slot]
+        if s0 != 2 * n + 2: # odd or newer → slot is being reused
+            return False
+        self._copy(out, i, self._buf[slot])
+        return self._slot_seq[slot] == s0
+
+    def _read_range(self, start, stop):
+        out = np.empty(stop - start, dtype=self._out)
+        keep = [i for i, n in enumerate(range(start, stop)) if self._read_slot(n, out, i)]
+        return out if len(keep) == len(out) else out[keep]
+
+    def _read_ring(self):
+        head = self._head[0]
+        if head < self._cursor: # writer restarted
+            self._cursor = 0
+        start = max(self._cursor, head - self._slots, 0)
+        if self._cursor >= 0:
+            self._missed += start - self._cursor # lapped by the writer
+        self._samples = self._read_range(start, head)
+        self._missed += head - start - len(self._samples) # overwritten while copying
+        self._cursor = head
+        if len(self._samples) == 0:
+            return False
+        stamps = self._samples['timestamp']
+        previous = np.concatenate(([self._last_stamp], stamps[:-1]))
+        self._duplicates += int(np.count_nonzero(stamps == previous)) # still delivered, rings keep every sample
+        self._last_stamp = stamps[-1]
+        self._last_seq = int(head)
+        self._data = self._samples[-1]
+        return True
+
+    @property
+    def samples(self):
+        """Every sample published since the previous ready() call, oldest first (at most one unless the writer has slots > 1)"""
+        return self._samples
+
+    @property
+    def missed(self):
+        """Samples published while connected that ready() never delivered, over this reader's lifetime: skipped
+        between two reads of a single-slot topic, or overwritten by a ring's writer before ready() got to them.
+        Zero means every sample published while connected was delivered"""
+        return self._missed
+
+    @property
+    def duplicates(self):
+        """Publishes that repeated the previous sample's timestamp. A single-slot reader treats them as stale,
+        a ring reader still delivers them in samples"""
+        return self._duplicates
+
+    @property
+    def last_seq(self):
+        """The writer's publish count when the newest delivered sample was published (1 for its first sample),
+        -1 until a sample from the current writer was delivered. Gaps between calls show what was missed"""
+        return self._last_seq
+
+    def latest(self, k):
+        """Newest k samples still held by the ring, oldest first. A single-slot topic only holds its current record"""
+        head = self._head[0]
+        if self._slots == 1:
+            if k > 1:
+                raise ValueError(f"{self._name} has a single slot, latest() can return at most 1 sample, not {k}")
+            if k < 1 or head == 0:
+                return np.empty(0, dtype=self._out)
+            return np.asarray(self._read()[0]).reshape(1)
+        return self._read_range(max(0, head - min(k, self._slots)), head)
 
     @property
     def data(self):
+        """Newest sample. From a borrowing whole-record reader of a writer on the same thread it is the writer's
+        record itself, read-only and updated in place by the writer's next publish. From a whole-record reader of
+        a dirty-tracked writer it is one of this reader's two copies: it stays as delivered through the next
+        ready(), which patches and delivers the other, and is patched again by the one after"""
         return self._data
 
     @property
@@ -306,5 +884,105 @@ class Reader:
             traceback.print_exception(exc_type, exc_val, exc_tb)
         if self._keeptime:
             Loop.remove(self._trigger)
+        self._detach()
         self._s.close()
-        return True
\ No newline at end of file
+        self._tlog.close()
+        return True
+
+
+def wait_any(readers: List[Reader], timeout=None) -> List[Reader]:
+    """Blocks until any of the readers has a sample not yet consumed by ready().
+    Returns those readers, or [] on timeout"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        check_stop()
+        alive = [r for r in readers if r._alive()]
+        words = [int(r._futex[0]) for r in alive]  # snapshot before checking heads so no publish is missed
+        fresh = [r for r in alive if r._head[0] != r._seen]
+        if fresh:
+            return fresh
+        remaining = 1.0 if deadline is None else deadline - time.monotonic()
+        if remaining <= 0:
+            return []
+        if len(alive) < len(readers): # some writers are not up yet, poll for them
+            remaining = min(remaining, 0.01)
+        for r in alive:
+            r._waiting()
+        if not alive:
+            time.sleep(remaining)
+        elif len(alive) == 1:
+            futex_wait(alive[0]._futex.ctypes.data, words[0], remaining)
+        elif not futex_wait_many([r._futex.ctypes.data for r in alive], words, remaining):
+            futex_wait(alive[0]._futex.ctypes.data, words[0], min(remaining, 0.001))
+
+
+class ReaderGroup:
+    """Waits on several topics at once and delivers their samples matched by writer timestamp.
+
+        with Reader("camera.points", keeptime=False) as r_points, Reader("localizer.pose", keeptime=False) as r_pose:
+            sync = ReaderGroup([r_points, r_pose], slop_ms=30)
+            while True:
+                points, pose = sync.next()
+
+    The first reader is the pivot: each of its samples is delivered once, with the sample of every other topic whose
+    timestamp is closest to it. A match is final once that topic has a sample at or after the pivot's, or slop_ms have
+    passed since it; pivot samples with no sample within slop_ms on some topic are dropped and counted in unmatched.
+    Each topic keeps its last history samples, so a pivot can be matched against the past"""
+    def __init__(self, readers: List[Reader], slop_ms=20, history=32):
+        assert not any(r._keeptime for r in readers), "ReaderGroup waits by itself, give it readers with keeptime=False"
+        self._readers = readers
+        self._slop = int(slop_ms * 1_000_000)
+        self._history = [deque(maxlen=history) for _ in readers]
+        self._unmatched = 0
+        self._decide_at = None # ns when the oldest pivot sample's match can no longer improve
+
+    def _poll(self, fresh):
+        for r, history in zip(self._readers, self._history):
+            if r in fresh and r.ready():
+                history.extend(r.samples.copy()) # samples may be the writer's record or a snapshot patched in place
+
+    def _match(self):
+        """Records matched to the oldest pivot sample, None while there is none or its match may still improve"""
+        self._decide_at = None
+        pivots = self._history[0]
+        while pivots:
+            t = int(pivots[0]['timestamp'].astype(np.int64))
+            picks = []
+            for history in self._history[1:]:
+                stamps = np.array([s['timestamp'] for s in history], dtype='datetime64[ns]').astype(np.int64)
+                if (not len(stamps) or stamps[-1] < t) and now_ns() < t + self._slop: # a closer sample may come
+                    self._decide_at = t + self._slop
+                    return None
+                i = int(np.argmin(np.abs(stamps - t))) if len(stamps) else -1
+                if i < 0 or abs(int(stamps[i]) - t) > self._slop:
+                    break
+                picks.append(i)
+            pivot = pivots.popleft()
+            if len(picks) < len(self._history) - 1:
+                self._unmatched += 1
+                continue
+            for history, i in zip(self._history[1:], picks):
+                for _ in range(i): # older samples are farther from every later pivot
+                    history.popleft()
+            return (pivot, *(history[0] for history in self._history[1:]))
+        return None
+
+    def next(self, timeout=None):
+        """Blocks until the next pivot sample is matched and returns one record per reader, None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            match = self._match()
+            if match is not None:
+                return match
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if self._decide_at is not None:
+                undecided = max(self._decide_at - now_ns(), 0) / 1e9
+                remaining = undecided if remaining is None else min(remaining, undecided)
+            self._poll(wait_any(self._readers, remaining))
+
+    @property
+    def unmatched(self):
+        """Pivot samples dropped because some topic had no sample within slop_ms of them"""
+        return self._unmatched
@@ -6,8 +6,10 @@ import numpy as np
 import difflib
 
 _periods: dict[str, float] = {}
+_memory: dict[str, tuple] = {} # type name -> allocation policy of its topics, see MEMORY in bbos/ipc.py
 _types: dict[str, callable] = {}  # functions & callables
 _config: dict[str, type] = {}  # classes
+_calls: dict[tuple, tuple] = {}  # (name, args, kwargs) -> Type(name)(*args, **kwargs), type functions are pure
 _lock = Lock()
 
 # --- Configs ---------------------------------------------------------------
@@ -44,8 +46,9 @@ def state(robj):
         return obj  # object remains intact
     return deco(robj)
 
-def realtime(ms: int):
-    """Decorator that registers a type that updates at a given period in milliseconds."""
+def realtime(ms: int, memory: tuple = ()):
+    """Decorator that registers a type that updates at a given period in milliseconds.
+    memory opts big topics into an allocation policy for their shared memory, e.g. ("huge", "populate", "lock")"""
     def deco(obj):
         key = obj.__name__
         assert not isclass(obj), "realtime decorator must be used on a type function"
@@ -57,30 +60,59 @@ def realtime(ms: int):
                 )
             _types[key] = obj
             _periods[key] = ms
+            if memory:
+                _memory[key] = tuple(memory)
         return obj  # object remains intact
     return deco
 
 # --- helpers ---------------------------------------------------------------
+def _require(name: str):
+    """Loads the daemon constants registering name on first use, returns every known name for suggestions"""
+    import bbos
+    return bbos._require(name)
+
+
+class Spec(tuple):
+    """(fields, period) as returned by calling a Type, carrying the type's memory policy to the Writer"""
+    def __new__(cls, fields, period, memory=()):
+        spec = super().__new__(cls, (fields, period))
+        spec.memory = memory
+        return spec
+
+
 class Type:
     def __init__(self, name: str):
         self._name = name
         if not self._name in _types:
-            raise ValueError(f"Type {self._name} not found! Maybe you meant one of: {difflib.get_close_matches(self._name, _types.keys())}")
+            known = _require(name)
+            if not self._name in _types:
+                raise ValueError(f"Type {self._name} not found! Maybe you meant one of: {difflib.get_close_matches(self._name, set(known) | _types.keys())}")
 
     @property
     def dtype(self):
         return _types[self._name]()
 
     def __call__(self, *args, **kwargs):
-        return _types[self._name](*args, **kwargs)+[("timestamp", 'datetime64[ns]')], _periods[self._name] if self._name in _periods else None
+        key = (self._name, args, tuple(sorted(kwargs.items())))
+        try:
+            cached = _calls.get(key)
+        except TypeError: # unhashable arguments (lists, arrays) are not cached
+            key, cached = None, None
+        if cached is None:
+            cached = _types[self._name](*args, **kwargs)+[("timestamp", 'datetime64[ns]')], _periods.get(self._name)
+            if key is not None:
+                _calls[key] = cached
+        fields, period = cached
+        return Spec(list(fields), period, _memory.get(self._name, ()))
 
 
 class Config:
     def __init__(self, name: str):
         if not name in _config:
-            raise ValueError(f"Config {name} not found! Maybe you meant one of: {difflib.get_close_matches(name, _config.keys())}")
-        else:
-            cfg = _config[name]
+            known = _require(name)
+            if not name in _config:
+                raise ValueError(f"Config {name} not found! Maybe you meant one of: {difflib.get_close_matches(name, set(known) | _config.keys())}")
+        cfg = _config[name]
         for k, v in cfg.__dict__.items():
             if not (k.startswith('__') and k.endswith('__')):
                 setattr(self, k, v)
@@ -88,8 +120,12 @@ class Config:
 
 
 def all_types():
+    import bbos
+    bbos._collect_daemon_constants()
     return {k: v() + [("timestamp", 'datetime64[ns]')] for k, v in _types.items()}
 
 
 def all_cfg():
+    import bbos
+    bbos._collect_daemon_constants()
     return _config
@@ -0,0 +1,128 @@
+"""
+Per-daemon scheduling profiles.
+
+A daemon opts in by registering a `<daemon>_sched` config next to its other configs in constants.py:
+
+    @register
+    class imu_sched:
+        cpus = (3,)       # CPU affinity set
+        fifo = 50         # SCHED_FIFO priority 1-99 for the thread that applies it, None stays SCHED_OTHER
+        nice = None       # nice value, used when fifo is None
+        mlockall = True   # lock current and future pages, no page faults in the loop
+
+The profile is applied once per daemon, when its first Writer or Reader is created, and a report of what
+took effect is printed to the daemon log. Daemons composed into one process (bbos/compose.py) each apply theirs
+on their own thread: affinity, priority and nice are per thread on Linux, mlockall covers the whole process.
+SCHED_FIFO is set with SCHED_RESET_ON_FORK, so threads started afterwards (bbos-status, helper threads) run as
+SCHED_OTHER; they still inherit the affinity, and so share the daemon's cores at a lower priority.
+SCHED_FIFO and mlockall need LimitRTPRIO/LimitMEMLOCK on the manager service (see install).
+`python -m bbos.sched` shows the effective policy of every running daemon.
+"""
+import os, sys, ctypes
+from pathlib import Path
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+POLICIES = {os.SCHED_OTHER: "OTHER", os.SCHED_FIFO: "FIFO", os.SCHED_RR: "RR",
+            os.SCHED_BATCH: "BATCH", os.SCHED_IDLE: "IDLE"}
+
+_applied = set() # daemon names
+libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _daemon_name():
+    from bbos.time import current_node
+    node = current_node()
+    main = node.main if node is not None else getattr(sys.modules['__main__'], '__file__', None)
+    return Path(main).parent.name if main else None
+
+
+def _set(report, policy, fn):
+    """Runs fn, appending (policy, ok, error) to report. Shared with the memory policies of bbos.ipc"""
+    try:
+        fn()
+        report.append((policy, True, None))
+    except OSError as e:
+        report.append((policy, False, e.strerror))
+
+
+def _check(res):
+    """Raises the OSError behind a libc call that returned nonzero"""
+    if res != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+def _print_report(kind, name, report):
+    print(f"[{'+' if all(ok for _, ok, _ in report) else '-'}] {kind} {name}: " +
+          ", ".join(policy if ok else f"{policy} FAILED ({err})" for policy, ok, err in report), flush=True)
+
+
+def apply(name=None):
+    """Applies the `<name>_sched` profile, name defaults to the daemon directory. Returns [(policy, ok, error)]"""
+    name = name or _daemon_name()
+    if name in _applied:
+        return []
+    _applied.add(name)
+    if name is None or not (Path(__file__).parent / "daemons" / name / "constants.py").is_file():
+        return [] # apps and scripts keep the default policy
+    from bbos import Config
+    try:
+        cfg = Config(f"{name}_sched")
+    except ValueError:
+        return []
+    cpus, fifo = getattr(cfg, "cpus", None), getattr(cfg, "fifo", None)
+    nice, mlock = getattr(cfg, "nice", None), getattr(cfg, "mlockall", False)
+    report = []
+    if cpus is not None:
+        _set(report, f"cpus {sorted(cpus)}", lambda: os.sched_setaffinity(0, cpus))
+    if fifo is not None:
+        _set(report, f"fifo {fifo}", lambda: os.sched_setscheduler(0, os.SCHED_FIFO | os.SCHED_RESET_ON_FORK,
+                                                                     os.sched_param(fifo)))
+    elif nice is not None:
+        _set(report, f"nice {nice}", lambda: os.setpriority(os.PRIO_PROCESS, 0, nice))
+    if mlock:
+        _set(report, "mlockall", lambda: _check(libc.mlockall(MCL_CURRENT | MCL_FUTURE)))
+    _print_report("sched", name, report)
+    return report
+
+
+def effective(pid):
+    """Scheduling state a process actually runs with, read back from /proc"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/status") as f:
+        status = dict(line.split(":", 1) for line in f if ":" in line)
+    return {"cpus": status["Cpus_allowed_list"].strip(),
+            "policy": POLICIES.get(int(fields[38]), fields[38]), # field 41 of stat, counted after the comm
+            "priority": int(fields[37]),
+            "nice": int(fields[16]),
+            "locked": status.get("VmLck", "0 kB").strip()}
+
+
+def daemons():
+    """pid -> daemon name for every `python daemon.py <name>` started by the manager"""
+    found = {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv = f.read().split(b"\0")
+        except OSError:
+            continue
+        if len(argv) >= 3 and argv[0].endswith(b"python") and argv[1] == b"daemon.py":
+            found[int(pid)] = argv[2].decode()
+    return found
+
+
+def main():
+    print(f"{'DAEMON':<16}{'PID':>8}  {'POLICY':<7}{'PRIO':>5}{'NICE':>5}  {'CPUS':<10}LOCKED")
+    for pid, name in sorted(daemons().items(), key=lambda d: d[1]):
+        try:
+            e = effective(pid)
+        except OSError:
+            continue
+        print(f"{name:<16}{pid:>8}  {e['policy']:<7}{e['priority']:>5}{e['nice']:>5}  {e['cpus']:<10}{e['locked']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Startup milestones of this process, for bench/startup.py.
+
+Only active when BBOS_STARTUP_TRACE names a file. Time spent loading daemon constants and setting up Writers and
+Readers (shm, sockets) is accumulated, and on the first publish one JSON line is appended to that file.
+BBOS_LAUNCH_NS, the CLOCK_MONOTONIC time the launcher started the process, anchors the import phase.
+"""
+import os, json, time
+
+TRACE = os.environ.get("BBOS_STARTUP_TRACE")
+PENDING = TRACE is not None # cleared after the first publish, checked by Writer on every publish
+_start = time.monotonic_ns()
+_durations = {} # phase -> ns
+_first = {}     # phase -> monotonic ns it first started
+
+
+def add(phase, t0):
+    """Accounts monotonic_ns() - t0 to phase"""
+    if PENDING:
+        _first.setdefault(phase, t0)
+        _durations[phase] = _durations.get(phase, 0) + time.monotonic_ns() - t0
+
+
+def published(topic):
+    global PENDING
+    PENDING = False
+    now = time.monotonic_ns()
+    launch = int(os.environ.get("BBOS_LAUNCH_NS", _start))
+    record = {"pid": os.getpid(), "topic": topic, "launch_ns": launch, "bbos_import_ns": _start,
+              "first_publish_ns": now, "first": _first, "durations": _durations}
+    try:
+        with open(TRACE, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        pass
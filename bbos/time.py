@@ -1,8 +1,50 @@
 import math, struct, time, ctypes
 from pathlib import Path
 from ctypes import c_long
-import sys
+import sys, os, threading
 WHOAMI = f"{Path(sys.modules['__main__'].__file__).parent.name}__{Path(sys.modules['__main__'].__file__).name[:-3]}"
+_node = threading.local() # .current is the Node the thread runs, unset outside of bbos.compose
+
+
+class Node:
+    """A daemon composed into a shared process, see bbos/compose.py. Its threads report under its own
+    name and keep their own Loop schedule"""
+    def __init__(self, main):
+        self.main = str(main)
+        self.loop = _LoopState()
+        self.stopping = False # set by Composition.close, see check_stop
+
+
+def bind_node(node: Node | None):
+    """Runs the calling thread as node, None goes back to the process's __main__"""
+    _node.current = node
+
+
+def current_node() -> Node | None:
+    return getattr(_node, "current", None)
+
+
+def check_stop():
+    """Raises KeyboardInterrupt in a thread whose node was asked to stop, as SIGINT would in a daemon of its own.
+    Loop.keeptime and wait_any call it, so a composed daemon stops within one period or wait"""
+    node = current_node()
+    if node is not None and node.stopping:
+        raise KeyboardInterrupt
+
+
+def node_main() -> str:
+    """Entry point of the calling thread's node, the process's __main__ file outside of composition"""
+    node = current_node()
+    return node.main if node is not None else sys.modules['__main__'].__file__
+
+
+def whoami() -> str:
+    """WHOAMI of the calling thread's node"""
+    node = current_node()
+    if node is None:
+        return WHOAMI
+    main = Path(node.main)
+    return f"{main.parent.name}__{main.name[:-3]}"
 
 
 class timespec(ctypes.Structure):
@@ -10,11 +52,111 @@ class timespec(ctypes.Structure):
                 ("tv_nsec", c_long)]
 librt = ctypes.CDLL("librt.so.1", use_errno=True)
 CLOCK_MONOTONIC = 1
+TIMER_ABSTIME = 1
+EINTR = 4
 
 def ns_sleep(ns: int):
     ts = timespec(ns // 1_000_000_000, ns % 1_000_000_000)
     librt.clock_nanosleep(CLOCK_MONOTONIC, 0, ctypes.byref(ts), None)
 
+def ns_sleep_until(deadline: int, spin_ns: int = 0):
+    """Sleeps until deadline (CLOCK_MONOTONIC ns) with TIMER_ABSTIME, busy-waiting the last spin_ns of it"""
+    wake = deadline - spin_ns
+    if wake > time.monotonic_ns():
+        ts = timespec(wake // 1_000_000_000, wake % 1_000_000_000)
+        while librt.clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, ctypes.byref(ts), None) == EINTR:
+            pass # absolute deadline, so retrying never oversleeps
+    while time.monotonic_ns() < deadline:
+        pass
+
+
+class Clock:
+    """Real time. Every bbos timestamp, deadline and Loop sleep goes through the active clock, see set_clock()"""
+    def time_ns(self) -> int:
+        return time.time_ns()
+
+    def monotonic_ns(self) -> int:
+        return time.monotonic_ns()
+
+    def sleep_until(self, deadline: int, spin_ns: int = 0):
+        ns_sleep_until(deadline, spin_ns)
+
+
+class SimClock(Clock):
+    """Simulated time shared by every process through shared memory and advanced by a driver (bag replay, a test)
+    with set()/step(). It stands in for both wall and monotonic time, so timestamps and deadlines share one axis.
+    Daemons pick it up with BBOS_CLOCK=sim; a fresh clock starts at the current wall time"""
+    SHM_NAME = "bbos__clock"
+    def __init__(self, name: str = SHM_NAME):
+        import posix_ipc, mmap
+        try:
+            shm = posix_ipc.SharedMemory(name, flags=posix_ipc.O_CREX, size=64)
+            created = True
+        except posix_ipc.ExistentialError:
+            shm = posix_ipc.SharedMemory(name)
+            created = False
+        self._name = name
+        self._map = mmap.mmap(shm.fd, 64, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        shm.close_fd()
+        self._futex = ctypes.c_uint32.from_buffer(self._map, 0) # bumped on every step, sleepers wait on it
+        self._now = ctypes.c_int64.from_buffer(self._map, 8)
+        if created:
+            self._now.value = time.time_ns()
+
+    def time_ns(self) -> int:
+        return self._now.value
+
+    def monotonic_ns(self) -> int:
+        return self._now.value
+
+    def set(self, t: int):
+        """Moves sim time to t ns and wakes every process sleeping on it, callers keep it non-decreasing"""
+        from bbos.ipc import futex_wake
+        self._now.value = t
+        self._futex.value = (self._futex.value + 1) & 0xFFFFFFFF
+        futex_wake(ctypes.addressof(self._futex))
+
+    def step(self, ns: int):
+        self.set(self._now.value + ns)
+
+    def sleep_until(self, deadline: int, spin_ns: int = 0):
+        from bbos.ipc import futex_wait
+        while True:
+            seen = self._futex.value
+            if self._now.value >= deadline:
+                return
+            futex_wait(ctypes.addressof(self._futex), seen, timeout=0.1)
+
+    def close(self):
+        del self._futex, self._now # exported pointers keep the map open
+        self._map.close()
+
+    @staticmethod
+    def unlink(name: str = SHM_NAME):
+        import posix_ipc
+        try:
+            posix_ipc.unlink_shared_memory(name)
+        except posix_ipc.ExistentialError:
+            pass
+
+
+_clock = SimClock() if os.environ.get("BBOS_CLOCK") == "sim" else Clock()
+
+def set_clock(clock: Clock):
+    """Swaps the process clock, e.g. set_clock(SimClock()) in a test or replay driver, before any Writer or Reader exists"""
+    global _clock
+    _clock = clock
+
+def clock() -> Clock:
+    return _clock
+
+def now_ns() -> int:
+    """Wall time of the active clock, what Writers stamp samples with"""
+    return _clock.time_ns()
+
+def monotonic_ns() -> int:
+    return _clock.monotonic_ns()
+
 # https://github.com/commaai/openpilot/blob/master/common/util.py#L23
 class MovingAverage:
     def __init__(self, window_size: int):
@@ -66,79 +208,249 @@ class MovingAverage:
         return math.sqrt(max(0.0, variance))
 
 
+class LogHistogram:
+    """Log-bucketed histogram (8 buckets per power of two, ~6% error) over the last one to two windows"""
+    SUB_BITS = 3
+    def __init__(self, window_ns: int = 10_000_000_000):
+        self._window_ns = window_ns
+        self._cur = [0] * (64 << self.SUB_BITS)
+        self._prev = [0] * (64 << self.SUB_BITS)
+        self._since = monotonic_ns()
+
+    @classmethod
+    def bucket(cls, v: int) -> int:
+        v = max(int(v), 1)
+        e = v.bit_length() - 1
+        if e < cls.SUB_BITS:
+            return v
+        return ((e - cls.SUB_BITS + 1) << cls.SUB_BITS) + ((v >> (e - cls.SUB_BITS)) & ((1 << cls.SUB_BITS) - 1))
+
+    @classmethod
+    def value(cls, idx: int) -> int:
+        """Midpoint of a bucket"""
+        sub = 1 << cls.SUB_BITS
+        if idx < sub:
+            return idx
+        e, m = (idx >> cls.SUB_BITS) + cls.SUB_BITS - 1, idx & (sub - 1)
+        lo = (sub + m) << (e - cls.SUB_BITS)
+        return lo + (1 << (e - cls.SUB_BITS)) // 2
+
+    def add(self, v: float, now: int):
+        if now - self._since > self._window_ns:
+            self._prev, self._cur = self._cur, self._prev
+            self._cur[:] = [0] * len(self._cur)
+            self._since = now
+        self._cur[self.bucket(v)] += 1
+
+    def percentiles(self, qs) -> list[int]:
+        counts = [a + b for a, b in zip(self._cur, self._prev)]
+        total = sum(counts)
+        if total == 0:
+            return [0] * len(qs)
+        out, acc, i = [], 0, 0
+        for q in sorted(qs):
+            while acc + counts[i] < q * total:
+                acc += counts[i]
+                i += 1
+            out.append(self.value(i))
+        return out
+
+
 class TimeLog:
-    time_store = struct.Struct("<qqq") # avg, std, max
+    time_store = struct.Struct("<qqq4q4q3q") # avg, std, max, period p50/p90/p99/p99.9, latency p50/p90/p99/p99.9,
+                                             # missed, duplicates, last seq
+    PERCENTILES = (0.5, 0.9, 0.99, 0.999)
     def __init__(self, name):
         from bbos.ipc import Status
         self._name = name
         self._buf = MovingAverage(10)
+        self._period = LogHistogram()
+        self._latency = LogHistogram()
         self._last = -1
-        self._status = Status(f"{name}__{WHOAMI}__timelog")
-    def log(self):
+        self._counts = (0, 0, -1)
+        self._status = Status(f"{name}__{whoami()}__timelog")
+    def log(self, latencies=(), counts=None):
+        """Logs one read, latencies are the publish-to-read delays of the samples it returned and counts the
+        reader's missed, duplicates and last_seq after it"""
+        now = monotonic_ns()
         if self._last < 0:
-            self._last = time.monotonic_ns()
-        self._buf.add(float(time.monotonic_ns()-self._last))
-        self._last = time.monotonic_ns()
+            self._last = now
+        self._buf.add(float(now-self._last))
+        self._period.add(now-self._last, now)
+        for l in latencies:
+            self._latency.add(l, now)
+        self._last = now
+        if counts is not None:
+            self._counts = counts
         if self._buf.is_reset():
-            self._status.update(self.time_store.pack(int(self._buf.avg()), int(self._buf.std()), int(self._buf.max())))
+            self._status.update(self.time_store.pack(int(self._buf.avg()), int(self._buf.std()), int(self._buf.max()),
+                                                     *self._period.percentiles(self.PERCENTILES),
+                                                     *self._latency.percentiles(self.PERCENTILES), *self._counts))
+    def close(self):
+        self._status.close()
+
+
+class _LoopState:
+    """Loop's per-node state for a composed node, the process's own lives on Loop itself"""
+    def __init__(self):
+        self._status = None
+        self._jitter = LogHistogram()
+        self._spin_ns = 0
+        self._lag_count = 0
+        self._last = -1
+        self._reported = -Loop.REPORT_NS
+        self._triggers = {}
+        self._num_calls = 0
+        self._i = 0
+        self._manage_period = True
+        self._lagging = False
+        self._phase = 0
 
 
 class Loop:
-    _period = 100 # ms
+    """Earliest-deadline-first scheduler shared by every Writer and Reader in the process, or in the node when
+    daemons are composed into one process. Each trigger keeps its own deadline; a tick sleeps until the nearest
+    one and fires only the triggers that are due, so periods never collapse to their GCD and lag never fires
+    every stream at once. Nodes share the epoch but each is shifted from it by its own phase, so a composed
+reader does not wake on the same tick as its writer and race it for every sample"""
+    loop_store = struct.Struct("<qqq4q") # period ms, lagging, times lagged, wakeup jitter p50/p90/p99/p99.9
+    EARLY_NS = 200_000 # deadlines this close to a tick fire with it
+    SPIN_US = 100 # default busy-wait slice for precise(), covers the ~15-110us p50 of clock_nanosleep's timer slack
+    REPORT_NS = 1_000_000_000 # status socket refresh, see _report
+    NODE_PHASE_NS = 1_237_000 # shift between composed nodes, no whole-ms period puts two of them back in phase
+    _status = None
+    _jitter = LogHistogram()
+    _spin_ns = 0
+    _lag_count = 0
+    _period = 100 # ms, tick period while no trigger has one
+    _epoch = -1 # deadlines are multiples of their period from here, so commensurate periods stay in phase
     _last = -1
-    _requested_ms = set()
-    _triggers = {}
+    _reported = -REPORT_NS # when _report last ran
+    _triggers = {} # hex(id(trigger)) -> [trigger, period ns or None, next deadline ns, overruns]
     _num_calls = 0
     _i = 0
     _manage_period = True
     _lagging = False
+    _phase = 0 # ns this schedule's deadlines sit after the epoch's
+
+    @staticmethod
+    def _node():
+        """Holder of the calling thread's schedule"""
+        node = current_node()
+        return Loop if node is None else node.loop
+
     @staticmethod
     def keeptime():
-        if Loop._i >= Loop._num_calls - 1:
-            Loop._i = 0 
-            if Loop._last > 0:
-                sleep_for = 1_000_000*Loop._period - (time.monotonic_ns() - Loop._last)
+        check_stop()
+        L = Loop._node()
+        if L._i >= L._num_calls - 1:
+            L._i = 0 
+            if L._last > 0:
+                deadline = Loop._next_deadline()
+                sleep_for = deadline - monotonic_ns()
                 if sleep_for >= 0:
-                    if Loop._manage_period:
-                        ns_sleep(sleep_for)
-                    Loop._lagging = False
+                    if L._manage_period:
+                        _clock.sleep_until(deadline, L._spin_ns)
+                        now = monotonic_ns()
+                        L._jitter.add(now - deadline, now)
+                    L._lagging = False
                 else:
-                    Loop._lagging = True
+                    L._lagging = True
+                    L._lag_count += 1
                     print(f"[-] Loop lagging by {(sleep_for) * 1e-6:.2f}ms", flush=True)
-            Loop._last = time.monotonic_ns()
-            for trigger, reset in Loop._triggers.values():
-                trigger[0] = (trigger[0] + 1) % reset if not Loop._lagging else 0
+            L._last = monotonic_ns()
+            Loop._fire(L._last)
+            if L._last - L._reported >= Loop.REPORT_NS: # percentiles stay off the path between wakeup and _fire
+                L._reported = L._last
+                Loop._report()
         else:
-            Loop._i += 1
-    
+            L._i += 1
+
+    @staticmethod
+    def _next_deadline():
+        L = Loop._node()
+        deadlines = [d for _, period, d, _ in L._triggers.values() if period is not None]
+        return min(deadlines) if deadlines else L._last + 1_000_000*Loop._period
+
+    @staticmethod
+    def _fire(now):
+        L = Loop._node()
+        for t in L._triggers.values():
+            trigger, period, deadline, _ = t
+            if period is None: # no period yet, runs every tick
+                trigger[0] = 0
+            elif deadline - now <= Loop.EARLY_NS:
+                trigger[0] = 0
+                late = now - deadline
+                if late > period // 10:
+                    t[3] += 1 + late // period # this deadline and any skipped whole periods
+                t[2] = deadline + (max(late, 0) // period + 1) * period
+            else:
+                trigger[0] = 1
+
+    @staticmethod
+    def _report():
+        L = Loop._node()
+        if L._status is None:
+            from bbos.ipc import Status
+            L._status = Status(f"{whoami()}__loop")
+        periods = [period for _, period, _, _ in L._triggers.values() if period is not None]
+        period_ms = min(periods) // 1_000_000 if periods else Loop._period
+        L._status.update(Loop.loop_store.pack(period_ms, L._lagging, L._lag_count, *Loop.jitter()))
+
     @staticmethod
     def init(trigger):
-        Loop._num_calls += 1
-        Loop._triggers[hex(id(trigger))] = [trigger,1]
+        L = Loop._node()
+        L._num_calls += 1
+        L._triggers[hex(id(trigger))] = [trigger, None, 0, 0]
     
     @staticmethod
     def remove(trigger):
-        Loop._num_calls -= 1
-        Loop._triggers.pop(hex(id(trigger)))
+        L = Loop._node()
+        L._num_calls -= 1
+        L._triggers.pop(hex(id(trigger)))
 
     @staticmethod
     def manage_period(value):
+        L = Loop._node()
         assert isinstance(value, bool)
-        Loop._manage_period = value
+        L._manage_period = value
+
+    @staticmethod
+    def precise(spin_us: int = SPIN_US):
+        """Sleeps until spin_us before each deadline and busy-waits the rest, trading that slice of a core
+        for wakeups that no longer depend on scheduler slack. spin_us=0 goes back to sleeping only"""
+        L = Loop._node()
+        assert spin_us >= 0 and isinstance(spin_us, int)
+        L._spin_ns = 1000*spin_us
+
+    @staticmethod
+    def jitter(qs=TimeLog.PERCENTILES):
+        """Percentiles of how late the loop woke past its deadlines in ns, over the last 10-20s"""
+        L = Loop._node()
+        return L._jitter.percentiles(qs)
+
+    @staticmethod
+    def overruns(trigger):
+        """Deadlines the trigger fired more than a tenth of its period late, or skipped entirely"""
+        L = Loop._node()
+        return L._triggers[hex(id(trigger))][3]
 
     @staticmethod
     def set_ms(ms, trigger):
+        """Sets the trigger's period, None makes it fire on every tick"""
+        L = Loop._node()
+        t = L._triggers[hex(id(trigger))]
+        if ms is None:
+            t[1] = None
+            return
         assert ms > 0 and isinstance(ms, int)
-        if not ms in Loop._requested_ms:
-            Loop._requested_ms.add(ms)
-            print(Loop._requested_ms)
-            new_period = math.gcd(*Loop._requested_ms)
-            if len(Loop._requested_ms) != 1 and new_period != Loop._period:
-                multiplier = Loop._period // new_period
-                for t in Loop._triggers:
-                    Loop._triggers[t][1] *= multiplier
-                print(f"[+] Changed Loop._period from {Loop._period}ms to {new_period}ms")
-            Loop._period = new_period
-        Loop._triggers[hex(id(trigger))] = [trigger, int(ms / Loop._period)]
-        print(f"[+] Loop._period: {Loop._period}ms")
-        print(Loop._triggers)
\ No newline at end of file
+        now = monotonic_ns()
+        if Loop._epoch < 0:
+            Loop._epoch = now
+        period = 1_000_000*ms
+        t[1] = period
+        epoch = Loop._epoch + L._phase
+        t[2] = epoch + ((now - epoch) // period + 1) * period # the first sample goes out on creation
+        print(f"[+] Loop trigger every {ms}ms", flush=True)
+
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of resolving daemon constants, each sample in a fresh interpreter.
+
+    python bench/constants_index.py [-n 10] [--type imu_orientation]
+
+eager: every constants.py is parsed and executed, as before the index existed
+cold:  lazy loading with no index on disk (first start after an edit)
+warm:  lazy loading from the persisted index
+"""
+import os, sys, json, argparse, tempfile, statistics, subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import time
+t0 = time.perf_counter()
+import numpy # every constants module needs it, so it is timed apart
+t1 = time.perf_counter()
+import bbos
+from bbos import Type
+if {eager}:
+    bbos._collect_daemon_constants()
+Type({type!r})()
+t2 = time.perf_counter()
+print(t2 - t0, t2 - t1)
+"""
+
+
+def sample(mode, type_name, cache):
+    env = dict(os.environ, PYTHONPATH=str(ROOT), XDG_CACHE_HOME=cache)
+    probe = PROBE.format(eager=mode == "eager", type=type_name)
+    out = subprocess.run([sys.executable, "-c", probe], env=env, capture_output=True, text=True, check=True)
+    total, constants = map(float, out.stdout.split()[-2:])
+    return total, constants
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--type", default="imu_orientation")
+    args = parser.parse_args()
+    results = {}
+    with tempfile.TemporaryDirectory() as warm:
+        sample("warm", args.type, warm) # writes the index
+        for mode in ("eager", "cold", "warm"):
+            runs = []
+            for _ in range(args.n):
+                with tempfile.TemporaryDirectory() as cold:
+                    runs.append(sample(mode, args.type, warm if mode == "warm" else cold))
+            results[mode] = {"total_ms": statistics.median(r[0] for r in runs) * 1e3,
+                             "constants_ms": statistics.median(r[1] for r in runs) * 1e3,
+                             "n": args.n}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Stand-in hardware drivers for bench/startup.py. They replace a daemon's `driver` module so it starts without the
+device attached; only the calls the daemons make are covered, and they answer instantly with a robot at rest.
+Must not import bbos: it is loaded before the daemon, whose WHOAMI is fixed on the first bbos import.
+"""
+import types
+import numpy as np
+
+
+class ICM42688P:
+    def __init__(self, bus, address):
+        pass
+
+    def reset(self):
+        pass
+
+    def configure(self, accel_range, gyro_range, sample_rate):
+        pass
+
+    def read(self):
+        return np.array([0., 0., 9.80665]), np.zeros(3), 25.0 # accel, gyro, temperature
+
+    def close(self):
+        pass
+
+
+class ODriveUART:
+    def __init__(self, cfg):
+        pass
+
+    def has_errors(self):
+        return False
+
+    def get_pos_vel_left(self):
+        return 0.0, 0.0
+
+    def get_pos_vel_right(self):
+        return 0.0, 0.0
+
+    def get_bus_voltage(self):
+        return 24.0
+
+    def __getattr__(self, name): # start_*, stop_*, clear_errors_*, enable_*, set_speed_*
+        return lambda *args, **kwargs: None
+
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    return mod
+
+
+STANDINS = {
+    "imu": {"driver": _module("driver", ICM42688P=ICM42688P)},
+    "drive": {"driver": _module("driver", ODriveUART=ODriveUART)},
+}
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Time from process start to first published sample for bbos daemons and apps.
+
+    python bench/startup.py                          # imu drive depth mapping, 3 runs each
+    python bench/startup.py imu apps/foo.py -n 5 --out startup.json
+    python bench/startup.py camera --hardware        # real devices, no stand-ins
+
+Each entry point runs in a fresh process with BBOS_STARTUP_TRACE set (see bbos/startup.py). The harness feeds the
+topics it consumes with zero-filled samples and subscribes to what it publishes, since depth and mapping only
+publish to readers. Phases per run, in ms:
+
+    import          launch until the first Writer/Reader is set up (interpreter, imports, daemon init)
+    constants       loading daemon constants, constants_index the index lookup that precedes it
+    ipc_setup       Writer/Reader shm and socket setup
+    first_publish   launch until the first Writer.buf()/[]= completes
+
+The JSON report has every run plus per-entry medians, so results can be diffed between commits.
+"""
+import os, sys, json, time, runpy, signal, argparse, platform, tempfile, statistics, subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DAEMONS = ROOT / "bbos" / "daemons"
+
+# what each daemon needs around it: topics to feed and topics to subscribe to
+ENTRIES = {
+    "imu": {"feeds": [], "subscribe": []},
+    "drive": {"feeds": [], "subscribe": []},
+    "camera": {"feeds": [], "subscribe": [], "hardware": "a V4L2 stereo camera"},
+    "depth": {"feeds": ["camera.jpeg"], "subscribe": ["camera.points"]},
+    "mapping": {"feeds": ["camera.points", "localizer.pose"], "subscribe": ["mapping.voxels"]},
+}
+DEFAULT = ["imu", "drive", "depth", "mapping"]
+PHASES = ["import", "constants_index", "constants", "ipc_setup", "first_publish"]
+
+
+def child(entry, standins):
+    """Runs inside the launched process: installs stand-ins, then the entry point as __main__"""
+    path = (DAEMONS / entry / "daemon.py") if entry in ENTRIES else Path(entry).resolve()
+    if standins:
+        sys.path.insert(0, str(Path(__file__).parent))
+        from standins import STANDINS
+        sys.modules.update(STANDINS.get(entry, {}))
+    os.chdir(path.parent)
+    sys.path[0] = str(path.parent)
+    sys.argv = [path.name, entry]
+    runpy.run_path(str(path), run_name="__main__")
+
+
+def _feeders(topics):
+    from bbos import Writer, Type
+    writers = []
+    try:
+        for topic in topics:
+            name = topic.replace(".", "_")
+            if name == "camera_jpeg":
+                frame = _jpeg()
+                writers.append(Writer(topic, Type(name)(2 * 1024 * 1024), keeptime=False))
+                with writers[-1].buf() as b:
+                    b["jpeg"][:len(frame)] = frame
+                    b["bytesused"] = len(frame)
+            else:
+                writers.append(Writer(topic, Type(name), keeptime=False))
+    except Exception:
+        for w in writers:
+            w.__exit__(None, None, None)
+        raise
+    return writers
+
+
+def _jpeg():
+    """A gray stereo frame at the camera's resolution"""
+    import cv2, numpy as np
+    from bbos import Config
+    cam = Config("stereo")
+    ok, data = cv2.imencode(".jpg", np.full((cam.height, cam.width, 3), 128, np.uint8))
+    return data.ravel()
+
+
+def run_once(entry, standins, timeout):
+    spec = ENTRIES.get(entry, {"feeds": [], "subscribe": []})
+    from bbos import Reader
+    try:
+        writers = _feeders(spec["feeds"]) # upstream is already running when the daemon starts
+    except ImportError as e:
+        return {"status": "error", "reason": f"cannot feed {spec['feeds']}: {e}"}
+    with tempfile.TemporaryDirectory() as tmp:
+        trace = Path(tmp) / "trace.jsonl"
+        env = dict(os.environ, BBOS_STARTUP_TRACE=str(trace), PYTHONPATH=str(ROOT))
+        env["BBOS_LAUNCH_NS"] = str(time.monotonic_ns())
+        cmd = [sys.executable, __file__, "--child", entry] + ([] if standins else ["--hardware"])
+        proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        readers = [Reader(t, keeptime=False) for t in spec["subscribe"]]
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline and proc.poll() is None and not trace.exists():
+                for w in writers:
+                    with w.buf():
+                        pass # same zero-filled (or jpeg) sample, restamped
+                for r in readers:
+                    r.ready()
+                time.sleep(0.05)
+        finally:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+                try:
+                    proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.wait()
+            for rw in readers + writers:
+                rw.__exit__(None, None, None)
+        if not trace.exists():
+            status = "timeout" if proc.returncode in (None, -signal.SIGINT, -signal.SIGKILL) else f"exited({proc.returncode})"
+            return {"status": status, "stderr": proc.stderr.read().decode(errors="replace")[-2000:]}
+        rec = json.loads(trace.read_text().splitlines()[0])
+    launch, first = rec["launch_ns"], rec["first"]
+    setup = first.get("ipc_setup", rec["first_publish_ns"])
+    out = {"status": "ok", "topic": rec["topic"],
+           "import": (setup - launch) / 1e6,
+           "first_publish": (rec["first_publish_ns"] - launch) / 1e6}
+    for phase in ("constants_index", "constants", "ipc_setup"):
+        out[phase] = rec["durations"].get(phase, 0) / 1e6
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench/startup.py")
+    parser.add_argument("entries", nargs="*", help="daemon names or app scripts")
+    parser.add_argument("-n", type=int, default=3, help="runs per entry")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the first publish")
+    parser.add_argument("--hardware", action="store_true", help="use the real drivers instead of stand-ins")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child, not args.hardware)
+
+    report = {"host": platform.node(), "machine": platform.machine(), "python": platform.python_version(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "standins": not args.hardware, "runs": [], "median": {}}
+    for entry in args.entries or DEFAULT:
+        needs = ENTRIES.get(entry, {}).get("hardware")
+        if needs and not args.hardware:
+            report["runs"].append({"entry": entry, "status": "skipped", "reason": f"needs {needs}, run with --hardware"})
+            continue
+        ok = []
+        for i in range(args.n):
+            res = {"entry": entry, "run": i, **run_once(entry, not args.hardware, args.timeout)}
+            report["runs"].append(res)
+            print(f"[bench] {entry} run {i}: {res['status']}"
+                  + (f" first publish {res['first_publish']:.0f}ms" if res["status"] == "ok" else ""), file=sys.stderr)
+            if res["status"] == "ok":
+                ok.append(res)
+        if ok:
+            report["median"][entry] = {p: statistics.median(r[p] for r in ok) for p in PHASES}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()